@@ -1,26 +1,54 @@
 #!/usr/bin/env python
 import asyncio
+import os
 
 import typer
 import uvicorn  # type: ignore
 from funcy import set_in, update_in  # type: ignore
 
-from api import postgres
+from api import postgres, static
 from api.config import get_config
+from api.logs import LogConfig
 
 cli = typer.Typer()
 
 
 @cli.command()
 def serve() -> None:
+    logs = LogConfig()
     log_config = uvicorn.config.LOGGING_CONFIG
 
-    for logger in ["api", "urllib3"]:
-        log_config = set_in(
-            log_config,
-            ["loggers", logger],
-            {"handlers": ["default"], "level": "DEBUG"},
-        )
+    # Our own loggers go through a queue, so request handlers don't
+    # block on formatting and writing. See `api.logs`.
+    log_config = set_in(
+        log_config,
+        ["filters", "sample"],
+        {"()": "api.logs.SampleFilter", "rates": logs.sample_rates},
+    )
+    log_config = set_in(
+        log_config,
+        ["handlers", "api"],
+        {
+            "()": "api.logs.queue_handler",
+            "format": logs.format.value,
+            "redact": logs.redact,
+            "stream": "ext://sys.stderr",
+            "filters": ["sample"],
+        },
+    )
+
+    log_config = set_in(
+        log_config,
+        ["loggers", "api"],
+        {"handlers": ["api"], "level": logs.level},
+    )
+    # At DEBUG, urllib3 logs every request URL including the query
+    # string, which redaction can't see into.
+    log_config = set_in(
+        log_config,
+        ["loggers", "urllib3"],
+        {"handlers": ["api"], "level": "WARNING"},
+    )
 
     for logger in ["uvicorn.error"]:
         log_config = set_in(
@@ -61,6 +89,15 @@ def serve() -> None:
     )
 
 
+@cli.command()
+def profile() -> None:
+    """
+    Serve with the sampling profiler enabled. See `api.profiler`.
+    """
+    os.environ["PROFILER_ENABLED"] = "true"
+    serve()
+
+
 @cli.command()
 def migrate() -> None:
     config = get_config()
@@ -69,5 +106,11 @@ def migrate() -> None:
     loop.run_until_complete(postgres.connect_and_migrate(config.postgres))
 
 
+@cli.command()
+def build_static() -> None:
+    config = get_config()
+    static.build(config.static_dir, config.static_build_dir)
+
+
 if __name__ == "__main__":
     cli()
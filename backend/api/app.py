@@ -7,11 +7,12 @@ import logging
 import typing as t
 from urllib.parse import urlencode
 
-from cryptography.fernet import InvalidToken
+from cryptography.fernet import Fernet, InvalidToken
 from fastapi import APIRouter, FastAPI
 from fastapi.param_functions import Depends
-from funcy import lmap, reraise  # type: ignore
+from funcy import lmap  # type: ignore
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 from starlette.responses import (
     HTMLResponse,
@@ -21,14 +22,18 @@ from starlette.responses import (
 )
 from starlette.staticfiles import StaticFiles
 
-from api.config import Config, get_config
+from api.config import Config, current_config, get_config
+from api.executor import Executor
 from api.github import (
     GitHubError,
     fetch_github_access_token,
     fetch_github_user,
 )
 from api.postgres import Connection, Postgres, connect_and_migrate
-from api.session import NewSession, Session, SessionProblem
+from api.profiler import Profiler, ProfilerMiddleware
+from api.session import NewSession, Session, SessionBatch, SessionProblem
+from api.static import MANIFEST, URL_PREFIX, StaticAssets, is_stale
+from api.utils import ignore_exc, maybe
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -37,21 +42,44 @@ router = APIRouter()
 class State(BaseModel):
     redirect: str
 
-    def encrypt(self, config: Config) -> str:
-        json_bytes = self.json().encode("utf-8")
-        ciphertext_bytes = config.state_encryption.encrypt(json_bytes)
-        return ciphertext_bytes.decode("utf-8")
+    async def encrypt(self) -> str:
+        return await Executor.run(encrypt_state, self)
 
     @staticmethod
-    def decrypt(config: Config, ciphertext: str) -> State:
-        with reraise(
-            InvalidToken,
-            Invalid(parameter="state", detail="could_not_decrypt"),
-        ):
-            json_val = config.state_encryption.decrypt(
-                ciphertext.encode("utf-8")
-            )
-        return State(**json.loads(json_val))
+    async def decrypt(ciphertext: str) -> State:
+        state = await Executor.run(decrypt_state, ciphertext)
+        if state is None:
+            raise Invalid(parameter="state", detail="could_not_decrypt")
+        return state
+
+
+# Set up once per process with `Executor.start`, so the key isn't sent
+# along with every call. Older versions of `cryptography` can't pickle
+# a `Fernet` at all.
+class StateEncryption:
+    _fernet: t.Optional[Fernet] = None
+
+    @staticmethod
+    def init(key: bytes) -> None:
+        StateEncryption._fernet = Fernet(key)
+
+    @staticmethod
+    def fernet() -> Fernet:
+        assert StateEncryption._fernet is not None
+        return StateEncryption._fernet
+
+
+# Module level so `Executor` can run them in another process.
+def encrypt_state(state: State) -> str:
+    json_bytes = state.json().encode("utf-8")
+    return StateEncryption.fernet().encrypt(json_bytes).decode("utf-8")
+
+
+def decrypt_state(ciphertext: str) -> t.Optional[State]:
+    json_val = ignore_exc(
+        StateEncryption.fernet().decrypt, InvalidToken, ciphertext.encode()
+    )
+    return maybe(lambda val: State(**json.loads(val)), json_val)
 
 
 @dataclasses.dataclass
@@ -99,7 +127,11 @@ async def get_app(
     conn: Connection = Depends(Postgres.connection),
     session: Session = Depends(Session.authenticated),
 ) -> Response:
-    logger.info(session.session_id)
+    logger.info(
+        "Listing users for user %s",
+        session.user_id,
+        extra={"event": "app.request", "session_id": session.session_id},
+    )
 
     users = await conn.fetch(
         "SELECT user_id, username, avatar_url FROM users;"
@@ -109,9 +141,9 @@ async def get_app(
 
 @router.get("/login")
 async def github_redirect_oauth(
-    config: Config = Depends(get_config),
+    config: Config = Depends(current_config),
 ) -> Response:
-    state = State(redirect="/").encrypt(config)
+    state = await State(redirect="/").encrypt()
 
     query_params = {
         "client_id": config.github.app_client_id,
@@ -134,20 +166,23 @@ async def github_callback(
     code: t.Optional[str] = None,
     state: t.Optional[str] = None,
     error: t.Optional[GitHubOAuthError] = None,
-    config: Config = Depends(get_config),
+    config: Config = Depends(current_config),
     conn: Connection = Depends(Postgres.connection),
 ) -> Response:
     if error:
-        logger.error(f"Error from GitHub: {error}")
+        logger.error("Error from GitHub: %s", error)
         return JSONResponse(status_code=400, content={"error": error.value})
     if state is None:
         raise Missing("state")
     if code is None:
         raise Missing("code")
 
-    state: State = State.decrypt(config, state)
-    token = fetch_github_access_token(config.github, code)
-    user = fetch_github_user(config.github, token)
+    state: State = await State.decrypt(state)
+    # `requests` blocks, keep it off the event loop.
+    token = await run_in_threadpool(
+        fetch_github_access_token, config.github, code
+    )
+    user = await run_in_threadpool(fetch_github_user, config.github, token)
 
     query = """
         INSERT INTO users (username, avatar_url)
@@ -172,9 +207,21 @@ def create_app() -> FastAPI:
 
     async def on_startup() -> None:
         await connect_and_migrate(config.postgres)
+        Executor.start(
+            config.executor,
+            initializer=StateEncryption.init,
+            initargs=(config.state_encryption_key,),
+        )
+        SessionBatch.start(config.sessions, config.postgres.pool_max_size)
+        if config.profiler.enabled:
+            Profiler.start(config.profiler)
 
     async def on_shutdown() -> None:
         await Postgres.disconnect()
+        Executor.shutdown()
+        SessionBatch.stop()
+        if config.profiler.enabled:
+            Profiler.stop()
 
     async def handle_github_error(_: Request, exc: GitHubError) -> Response:
         return exc.as_response()
@@ -196,10 +243,26 @@ def create_app() -> FastAPI:
         },
     )
 
-    app.mount(
-        "/static", app=StaticFiles(directory=config.static_dir, html=True)
-    )
+    # Serve the output of `python -m api build-static` when there is
+    # one. Otherwise serve `static/` as is.
+    if (config.static_build_dir / MANIFEST).exists():
+        logger.info("Serving static assets from %s", config.static_build_dir)
+        if is_stale(config.static_dir, config.static_build_dir):
+            logger.warning(
+                "%s changed since the last build, run `python -m api"
+                " build-static` to pick that up",
+                config.static_dir,
+            )
+        static: StaticFiles = StaticAssets(
+            directory=config.static_build_dir, html=True
+        )
+    else:
+        static = StaticFiles(directory=config.static_dir, html=True)
+    app.mount(URL_PREFIX, app=static)
 
     app.include_router(router)
 
+    if config.profiler.enabled:
+        app.add_middleware(ProfilerMiddleware)
+
     return app
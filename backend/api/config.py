@@ -9,8 +9,11 @@ from cryptography.fernet import Fernet
 from fastapi import Depends
 from pydantic import BaseSettings, validator
 
+from api.executor import ExecutorConfig
 from api.github import GitHubConfig
 from api.postgres import PostgresConfig
+from api.profiler import ProfilerConfig
+from api.session import SessionConfig
 
 DelayedInit: t.Any = None
 
@@ -19,11 +22,15 @@ class Config(BaseSettings):
     project_root: Path
     templates_dir: Path
     static_dir: Path
+    static_build_dir: Path
     host: str
     port: int
     github: GitHubConfig = DelayedInit
     postgres: PostgresConfig = DelayedInit
-    state_encryption: Fernet = DelayedInit
+    state_encryption_key: bytes = DelayedInit
+    profiler: ProfilerConfig = DelayedInit
+    executor: ExecutorConfig = DelayedInit
+    sessions: SessionConfig = DelayedInit
 
     # pylint: disable=no-self-argument,no-self-use
     @validator("github")
@@ -39,10 +46,32 @@ class Config(BaseSettings):
         return PostgresConfig(migrations_dir=migrations_dir)
 
     # pylint: disable=no-self-argument,no-self-use
-    @validator("state_encryption")
-    def populate_state_encryption(cls, _v: t.Any) -> Fernet:
-        key = Fernet.generate_key()
-        return Fernet(key)
+    @validator("state_encryption_key")
+    def populate_state_encryption_key(cls, _v: t.Any) -> bytes:
+        return Fernet.generate_key()
+
+    # pylint: disable=no-self-argument,no-self-use
+    @validator("profiler")
+    def populate_profiler(
+        cls, _v: t.Any, values: t.Dict[str, t.Any]
+    ) -> ProfilerConfig:
+        profiler = ProfilerConfig()
+        # Passing it in would win over `PROFILER_OUTPUT_DIR`.
+        if profiler.output_dir is None:
+            profiler.output_dir = (
+                values["project_root"] / "ignore" / "profiles"
+            )
+        return profiler
+
+    # pylint: disable=no-self-argument,no-self-use
+    @validator("executor")
+    def populate_executor(cls, _v: t.Any) -> ExecutorConfig:
+        return ExecutorConfig()
+
+    # pylint: disable=no-self-argument,no-self-use
+    @validator("sessions")
+    def populate_sessions(cls, _v: t.Any) -> SessionConfig:
+        return SessionConfig()
 
     @property
     def api_url(self) -> str:
@@ -53,11 +82,13 @@ class Config(BaseSettings):
         project_root = Path(os.environ["PROJECT_ROOT"])
         templates_dir = project_root / "templates"
         static_dir = project_root / "static"
+        static_build_dir = project_root / "ignore" / "build" / "static"
 
         return cls(
             project_root=project_root,
             templates_dir=templates_dir,
             static_dir=static_dir,
+            static_build_dir=static_build_dir,
         )
 
 
@@ -66,5 +97,11 @@ def get_config() -> Config:
     return Config.from_env()
 
 
-def get_github(config: Config = Depends(get_config)) -> GitHubConfig:
+# FastAPI runs sync dependencies in a thread pool. This saves a thread
+# hop on every request that needs the config.
+async def current_config() -> Config:
+    return get_config()
+
+
+def get_github(config: Config = Depends(current_config)) -> GitHubConfig:
     return config.github
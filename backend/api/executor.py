@@ -0,0 +1,94 @@
+"""
+Worker pool for CPU-bound work on the request path, such as the
+Fernet encryption of the OAuth state. Running it inline stalls every
+other request the worker is serving.
+
+`EXECUTOR_KIND` picks where `Executor.run` runs functions:
+
+ - `inline`: on the event loop, as if called directly.
+ - `thread`: in a thread pool. Only helps for work that releases the
+   GIL, such as OpenSSL in `cryptography`, but is cheap to hand off to.
+ - `process`: in a process pool. Sidesteps the GIL, but arguments and
+   results are pickled, so it only pays off for larger chunks of work.
+   Functions must be importable at module level.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import enum
+import logging
+import multiprocessing
+import typing as t
+
+from pydantic import BaseSettings
+
+logger = logging.getLogger(__name__)
+
+T = t.TypeVar("T")
+
+
+class ExecutorKind(enum.Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class ExecutorConfig(BaseSettings):
+    kind: ExecutorKind = ExecutorKind.THREAD
+    # Defaults to what `concurrent.futures` picks: `min(32, CPUs + 4)`
+    # threads, or one process per CPU.
+    workers: t.Optional[int] = None
+
+    class Config:
+        env_prefix = "executor_"
+
+
+class Executor:
+    _pool: t.Optional[concurrent.futures.Executor] = None
+
+    @staticmethod
+    def start(
+        config: ExecutorConfig,
+        initializer: t.Optional[t.Callable[..., None]] = None,
+        initargs: t.Tuple[t.Any, ...] = (),
+    ) -> None:
+        """
+        Start the pool. `initializer(*initargs)` runs once in this
+        process, and once in every worker process for `process`.
+        """
+        assert Executor._pool is None
+
+        if initializer is not None:
+            initializer(*initargs)
+
+        if config.kind == ExecutorKind.THREAD:
+            Executor._pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=config.workers, thread_name_prefix="executor"
+            )
+        elif config.kind == ExecutorKind.PROCESS:
+            # Forking a process that runs threads (the event loop's
+            # default executor, the log listener) can deadlock.
+            Executor._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=config.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            )
+
+        logger.info("Running CPU-bound work %s", config.kind.value)
+
+    @staticmethod
+    def shutdown() -> None:
+        if Executor._pool is not None:
+            Executor._pool.shutdown()
+            Executor._pool = None
+
+    @staticmethod
+    async def run(func: t.Callable[..., T], *args: t.Any) -> T:
+        if Executor._pool is None:
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(Executor._pool, func, *args)
@@ -4,7 +4,6 @@ import dataclasses
 import enum
 import logging
 import typing as t
-from urllib.parse import urlencode
 
 import funcy  # type: ignore
 import requests
@@ -62,7 +61,7 @@ class GitHubError(Exception):
         with funcy.suppress(ValueError):
             return GitHubError(GitHubErrorCode(error))
 
-        logger.error(f"Unknown GitHub error {error}")
+        logger.error("Unknown GitHub error %s", error)
         return GitHubError(GitHubErrorCode.UNKNOWN_ERROR)
 
     def as_response(self) -> JSONResponse:
@@ -91,16 +90,20 @@ def fetch_github_access_token(github: GitHubConfig, code: str) -> GitHubToken:
         "client_secret": github.app_client_secret,
         "code": code,
     }
-    url = f"{github.oauth_access_token_endpoint}?{urlencode(params)}"
     logger.info("Requesting GitHubConfig oauth token")
-    resp = requests.post(url, headers={"Accept": "application/json"})
+    # Keep the secret and code out of the URL, URLs end up in logs.
+    resp = requests.post(
+        github.oauth_access_token_endpoint,
+        data=params,
+        headers={"Accept": "application/json"},
+    )
     resp.raise_for_status()
 
     if error := GitHubError.from_json(resp.json()):
         raise error
 
     token = GitHubToken(**resp.json())
-    logger.debug(f"Received token {token}")
+    logger.debug("Received GitHub token expiring in %ss", token.expires_in)
     return token
 
 
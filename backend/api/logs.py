@@ -0,0 +1,172 @@
+"""
+Logging setup for the API.
+
+Log calls on the request path should cost as little as possible, so
+records are put on a queue and formatted and written by a background
+thread (`queue_handler`). Messages use `%`-style arguments so they are
+only formatted when the record is actually emitted.
+
+Per-request events pass an `event` name in `extra`. Events listed in
+`LogConfig.sample_rates` are only logged for that fraction of calls.
+Sensitive values should also go in `extra`, so `RedactFilter` can mask
+them by field name:
+
+    logger.info(
+        "Received session cookie",
+        extra={"event": "session.cookie", "session_id": session_id},
+    )
+"""
+
+from __future__ import annotations
+
+import atexit
+import datetime
+import enum
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import typing as t
+
+from pydantic import BaseSettings
+
+
+class LogFormat(enum.Enum):
+    JSON = "json"
+    TEXT = "text"
+
+
+class LogConfig(BaseSettings):
+    level: str = "INFO"
+    format: LogFormat = LogFormat.JSON
+    # Fraction of records to keep per event name, e.g.
+    # LOG_SAMPLE_RATES='{"session.cookie": 0.01}'. Events that are not
+    # listed are always logged.
+    sample_rates: t.Dict[str, float] = {
+        "session.cookie": 0.01,
+        "app.request": 0.01,
+    }
+    redact: t.List[str] = [
+        "session_id",
+        "cookie",
+        "code",
+        "state",
+        "access_token",
+        "refresh_token",
+    ]
+
+    class Config:
+        env_prefix = "log_"
+
+
+TEXT_FORMAT = "[%(name)s] %(levelname)s %(message)s"
+REDACTED = "[redacted]"
+
+# Attributes every `LogRecord` has. Anything else was passed in `extra`.
+RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime"}
+
+
+def extra_fields(record: logging.LogRecord) -> t.Dict[str, t.Any]:
+    return {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in RECORD_ATTRIBUTES
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line, including the fields
+    passed in `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **extra_fields(record),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keep only a fraction of the records for the events in `rates`.
+    """
+
+    def __init__(self, rates: t.Mapping[str, float]) -> None:
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None or event not in self.rates:
+            return True
+        return random.random() < self.rates[event]
+
+
+class RedactFilter(logging.Filter):
+    """
+    Mask the values of sensitive fields passed in `extra`.
+    """
+
+    def __init__(self, fields: t.Iterable[str]) -> None:
+        super().__init__()
+        self.fields = frozenset(fields)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field in self.fields.intersection(record.__dict__):
+            setattr(record, field, REDACTED)
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    `QueueHandler` that leaves formatting to the listener thread.
+
+    The stock `prepare` formats the message in the calling thread so
+    the record can be pickled for a multiprocessing queue. Our queue
+    stays within the process, so we skip that. Arguments are formatted
+    later, so mutable ones may show changes made after the log call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def queue_handler(
+    format: str = LogFormat.JSON.value,  # pylint: disable=redefined-builtin
+    redact: t.Iterable[str] = (),
+    stream: t.TextIO = sys.stderr,
+) -> logging.Handler:
+    """
+    Create a handler that hands records to a background thread, which
+    redacts, formats and writes them to `stream`.
+
+    Meant to be used from `logging.config.dictConfig` with `"()"`.
+    """
+    handler = logging.StreamHandler(stream)
+    if LogFormat(format) == LogFormat.JSON:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handler.addFilter(RedactFilter(redact))
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    # Flush whatever is still on the queue when the process exits.
+    atexit.register(listener.stop)
+
+    return DeferredQueueHandler(log_queue)
@@ -16,6 +16,7 @@ class PostgresConfig(BaseSettings):
     host: str
     port: int
     migrations_dir: Path
+    pool_max_size: int = 10
 
     # pylint: disable=no-self-argument,no-self-use
     @validator("host")
@@ -31,28 +32,48 @@ class PostgresConfig(BaseSettings):
         env_prefix = "postgres_"
 
 
+def connect_kwargs(postgres: PostgresConfig) -> t.Dict[str, t.Any]:
+    return {
+        "host": postgres.host,
+        "port": postgres.port,
+        "user": postgres.user,
+        "password": postgres.password,
+        "database": postgres.database,
+        "server_settings": {"application_name": "api"},
+    }
+
+
 async def initialize_pool(postgres: PostgresConfig) -> asyncpg.Pool:
+    # asyncpg keeps 10 connections open by default, more than the
+    # maximum if that is lower.
     return await asyncpg.create_pool(
-        host=postgres.host,
-        port=postgres.port,
-        user=postgres.user,
-        password=postgres.password,
-        database=postgres.database,
-        server_settings={"application_name": "api"},
+        **connect_kwargs(postgres),
+        min_size=min(10, postgres.pool_max_size),
+        max_size=postgres.pool_max_size,
     )
 
 
-async def connect_and_migrate(postgres: PostgresConfig) -> None:
-    migrations = [
+async def connect(postgres: PostgresConfig) -> asyncpg.Connection:
+    return await asyncpg.connect(**connect_kwargs(postgres))
+
+
+def read_migrations(postgres: PostgresConfig) -> t.List[str]:
+    return [
         migration.read_text()
-        for migration in postgres.migrations_dir.iterdir()
+        for migration in sorted(postgres.migrations_dir.iterdir())
         if migration.suffix == ".sql"
     ]
 
+
+async def migrate(conn: asyncpg.Connection, postgres: PostgresConfig) -> None:
+    for migration in read_migrations(postgres):
+        await conn.execute(migration)
+
+
+async def connect_and_migrate(postgres: PostgresConfig) -> None:
     await Postgres.connect(postgres)
     async with contextlib.asynccontextmanager(Postgres.connection)() as conn:
-        for migration in migrations:
-            await conn.execute(migration)
+        await migrate(conn, postgres)
 
 
 # FastAPI dependency for database connections. Saves the given pool
@@ -0,0 +1,307 @@
+"""
+Opt-in sampling profiler.
+
+A background thread wakes up every `interval` seconds and records the
+stacks of all requests in flight:
+
+ - The request running on the event loop at that moment gets its
+   thread stack, marked `[cpu]`.
+ - Requests that are suspended get the chain of coroutines they are
+   awaiting in, marked `[await]`. This shows where time goes while a
+   request waits on Postgres or another request hogs the loop.
+ - Other threads (e.g. the threadpool for sync dependencies) get their
+   thread stack, grouped by thread name.
+
+Samples are rooted at the request's method and matched route (e.g.
+`GET /users/{user_id}`), so a flamegraph of the output splits per
+route. Requests that match no route share `[unmatched]`. The output is
+in the collapsed stack format (`frame;frame;frame count`) that
+`flamegraph.pl`, speedscope and inferno read.
+
+Enable with `PROFILER_ENABLED=true` or `python -m api profile`. Send
+the process `SIGUSR1` to write the samples since the last dump to
+`output_dir` and start over. They are also written on shutdown.
+
+Taking a sample holds the GIL while walking stacks. At the default
+100 Hz that stays well within `OVERHEAD_BUDGET`, see
+`python -m bench profiler`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime
+import functools
+import itertools
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import types
+import typing as t
+from pathlib import Path
+
+from pydantic import BaseSettings
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Fraction of request throughput we are willing to lose to profiling.
+OVERHEAD_BUDGET = 0.02
+
+# Most suspended requests to walk per sample.
+MAX_AWAITING = 16
+
+UNMATCHED = "[unmatched]"
+
+
+class ProfilerConfig(BaseSettings):
+    enabled: bool = False
+    # Seconds between samples.
+    interval: float = 0.01
+    # Root samples at the individual request as well as the route. Adds
+    # a label per request until the next dump.
+    per_request: bool = False
+    # Defaults to `ignore/profiles` in the project root, see `Config`.
+    output_dir: t.Optional[Path] = None
+
+    class Config:
+        env_prefix = "profiler_"
+
+
+# Outermost frame first.
+Stack = t.Tuple[types.CodeType, ...]
+# Label, kind of sample and stack.
+Sample = t.Tuple[str, str, Stack]
+
+
+@functools.lru_cache(maxsize=None)
+def frame_name(code: types.CodeType) -> str:
+    return (
+        f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+    )
+
+
+def route_label(scope: Scope, request_id: t.Optional[int] = None) -> str:
+    # The router writes the matched route into the scope, so this only
+    # knows the route once routing is done.
+    route = scope.get("route")
+    if route is not None:
+        name = getattr(route, "path_format", route.path)
+    elif "endpoint" in scope:
+        # Mounts, e.g. the static files.
+        endpoint = scope["endpoint"]
+        name = getattr(endpoint, "__qualname__", type(endpoint).__name__)
+    else:
+        name = UNMATCHED
+
+    label = f"{scope['method']} {name}"
+    if request_id is not None:
+        label = f"{label};request {request_id}"
+    return label
+
+
+def thread_stack(frame: t.Optional[types.FrameType]) -> Stack:
+    stack = []
+    while frame is not None:
+        stack.append(frame.f_code)
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def await_stack(coro: t.Any) -> Stack:
+    stack = []
+    while True:
+        try:
+            frame, awaiting = coro.cr_frame, coro.cr_await
+        except AttributeError:
+            # Generator based coroutine, or the future we are waiting on.
+            try:
+                frame, awaiting = coro.gi_frame, coro.gi_yieldfrom
+            except AttributeError:
+                break
+        if frame is None:
+            break
+        stack.append(frame.f_code)
+        coro = awaiting
+    return tuple(stack)
+
+
+class Sampler(threading.Thread):
+    """
+    Thread that samples the stacks of the event loop it is started
+    from. Register requests with `requests[task] = (scope, request_id)`.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        interval: float,
+        per_request: bool = False,
+        max_awaiting: int = MAX_AWAITING,
+    ) -> None:
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.per_request = per_request
+        self.max_awaiting = max_awaiting
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.requests: t.Dict[
+            asyncio.Task[t.Any], t.Tuple[Scope, t.Optional[int]]
+        ] = {}
+        # Weighted, see `sample`.
+        self.samples: t.Dict[Sample, float] = collections.defaultdict(float)
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def sample(self) -> None:
+        frames = sys._current_frames()  # pylint: disable=protected-access
+        running = asyncio.current_task(self.loop)
+        # Copying is atomic under the GIL, iterating is not.
+        requests = list(self.requests.items())
+        loop_frame = frames.get(self.loop_thread_id)
+
+        # Count raw code objects, turning them into names is left for
+        # `collapsed`. Keeps the time we hold the GIL here short.
+        request = self.requests.get(running) if running else None
+        if request is not None:
+            label = route_label(*request)
+            self.samples[label, "[cpu]", thread_stack(loop_frame)] += 1
+        else:
+            self.samples["[event loop]", "", thread_stack(loop_frame)] += 1
+
+        # Walking every suspended request gets expensive under load.
+        # Walk a random subset and weigh it to stand in for all of them.
+        weight = 1.0
+        if len(requests) > self.max_awaiting:
+            weight = len(requests) / self.max_awaiting
+            requests = random.sample(requests, self.max_awaiting)
+        for task, request in requests:
+            if task is not running:
+                label = route_label(*request)
+                key = (label, "[await]", await_stack(task.get_coro()))
+                self.samples[key] += weight
+
+        for thread_id, frame in frames.items():
+            if thread_id not in (self.loop_thread_id, self.ident):
+                label = f"[thread {thread_id}]"
+                self.samples[label, "", thread_stack(frame)] += 1
+
+    def rotate(self) -> str:
+        """
+        Collapsed stacks of the samples since the last rotation. Starts
+        counting from scratch, so memory stays bounded while the
+        profiler runs.
+        """
+        # Called from the loop thread while the sampler keeps counting,
+        # see `sample` for why we copy.
+        old, self.samples = self.samples, collections.defaultdict(float)
+        samples = list(old.items())
+        threads = {
+            f"[thread {thread.ident}]": f"[thread {thread.name}]"
+            for thread in threading.enumerate()
+        }
+
+        lines: t.Dict[str, float] = collections.defaultdict(float)
+        for (label, kind, codes), count in samples:
+            stack = [threads.get(label, label), kind, *map(frame_name, codes)]
+            lines[";".join(filter(None, stack))] += count
+
+        return "".join(
+            f"{stack} {round(count)}\n"
+            for stack, count in lines.items()
+            if round(count) > 0
+        )
+
+
+class Profiler:
+    """
+    Holds the sampler for the app.
+    """
+
+    _sampler: t.Optional[Sampler] = None
+    _config: t.Optional[ProfilerConfig] = None
+
+    @staticmethod
+    def start(config: ProfilerConfig) -> None:
+        assert Profiler._sampler is None
+        Profiler._config = config
+        Profiler._sampler = Sampler(config.interval, config.per_request)
+        Profiler._sampler.start()
+
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGUSR1, Profiler.dump)
+        logger.info(
+            "Profiling every %ss, send SIGUSR1 to %s to dump to %s",
+            config.interval,
+            os.getpid(),
+            config.output_dir,
+        )
+
+    @staticmethod
+    def sampler() -> t.Optional[Sampler]:
+        return Profiler._sampler
+
+    @staticmethod
+    def stop() -> None:
+        assert Profiler._sampler is not None
+        Profiler._sampler.stop()
+        Profiler.dump()
+        Profiler._sampler = None
+        Profiler._config = None
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+
+    @staticmethod
+    def dump() -> t.Optional[Path]:
+        if Profiler._sampler is None or Profiler._config is None:
+            return None
+
+        output_dir = Profiler._config.output_dir
+        assert output_dir is not None
+        output_dir.mkdir(parents=True, exist_ok=True)
+        now = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = output_dir / f"profile-{os.getpid()}-{now}.collapsed"
+        path.write_text(Profiler._sampler.rotate())
+
+        logger.info("Wrote profile to %s", path)
+        return path
+
+
+class ProfilerMiddleware:
+    """
+    Label the task serving each request, so the sampler can attribute
+    its stacks. Pure ASGI, so the endpoint runs in the same task.
+    """
+
+    request_ids = itertools.count()
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        sampler = Profiler.sampler()
+        task = asyncio.current_task()
+        if scope["type"] != "http" or sampler is None or task is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next(self.request_ids) if sampler.per_request else None
+        sampler.requests[task] = (scope, request_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            del sampler.requests[task]
@@ -1,16 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import dataclasses
 import datetime
+import email.utils
 import enum
-import http.cookies
 import logging
 import typing as t
 import uuid
 
 from fastapi import Cookie, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, BaseSettings
 
 from api.postgres import Connection, Postgres
+from api.utils import Batched
 
 logger = logging.getLogger(__name__)
 
@@ -20,21 +24,58 @@ class SessionStatus(enum.Enum):
     REVOKED = "revoked"
 
 
+class SessionConfig(BaseSettings):
+    # Group the session inserts of concurrent logins into one query, to
+    # save commits when many users log in at once, e.g. after revoking
+    # all sessions. Every login in a batch holds a connection while it
+    # waits, so batches are at most as large as the pool. Only pays off
+    # when commits are the bottleneck, see `python -m bench sessions`.
+    batch_inserts: bool = False
+    # Seconds to wait for more sessions after the first one in a batch.
+    batch_window: float = 0.001
+    # At most `POSTGRES_POOL_MAX_SIZE`, which is the default.
+    batch_max_size: t.Optional[int] = None
+
+    class Config:
+        env_prefix = "session_"
+
+
 class NewSession(BaseModel):
     user_id: int
 
     async def create(self, conn: Connection) -> Session:
-        logger.info(f"Minting new session for user {self.user_id}")
+        logger.info(
+            "Minting new session for user %s",
+            self.user_id,
+            extra={"event": "session.create"},
+        )
+
+        if (batched := SessionBatch.batched()) is not None:
+            pending = PendingSession(uuid.uuid4(), self.user_id, conn)
+            loading = asyncio.ensure_future(batched.load(pending))
+            try:
+                session = await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                # The batch may run on `conn`, which goes back to the
+                # pool when we return. Hold on to it until it is done.
+                while not loading.done():
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await asyncio.wait([loading])
+                if not loading.cancelled():
+                    loading.exception()  # Retrieved, don't warn about it.
+                raise
+            assert session is not None
+            return session
 
         query = """
             INSERT INTO sessions (user_id, status)
             VALUES ($1, $2)
-            RETURNING session_id, created_at, expires_at"""
+            RETURNING session_id, user_id, created_at, expires_at"""
 
         status = SessionStatus.VALID
         row = await conn.fetchrow(query, self.user_id, status.value)
 
-        return Session(**{"user_id": self.user_id, "status": status, **row})
+        return Session.from_record(row, row["session_id"], status)
 
 
 class SessionProblem(enum.Enum):
@@ -48,30 +89,53 @@ class SessionProblem(enum.Enum):
         return HTTPException(status_code=status_code, detail=detail)
 
 
-class Session(NewSession):
+# Attributes in the order `http.cookies.Morsel` writes them, so the
+# output matches what `SimpleCookie.output(header="")` would give.
+#
+# SameSite needs to be `lax` instead of `strict` to get FireFox to send
+# the session cookie when navigating back from GitHub's login. (Tested
+# with FF 88)
+COOKIE_TEMPLATE = (
+    " session_id={session_id}; expires={expires}; HttpOnly; Path=/;"
+    " SameSite=lax; Secure"
+)
+
+
+# Sessions are loaded on every authenticated request, so this is a
+# plain slotted class instead of a pydantic model. The data comes from
+# our own database, there is nothing to validate.
+@dataclasses.dataclass
+class Session:
+    __slots__ = ("user_id", "session_id", "created_at", "expires_at", "status")
+
+    user_id: int
     session_id: uuid.UUID
     created_at: datetime.datetime
     expires_at: datetime.datetime
     status: SessionStatus
 
-    def as_cookie(self) -> str:
-        # pylint: disable=unsubscriptable-object
-        cookie: http.cookies.SimpleCookie[str] = http.cookies.SimpleCookie()
-
-        now = datetime.datetime.now(datetime.timezone.utc)
-        expires = (self.expires_at - now).total_seconds()
-
-        cookie["session_id"] = self.session_id.hex
-        cookie["session_id"]["expires"] = expires
-        cookie["session_id"]["httponly"] = True
-        cookie["session_id"]["secure"] = True
-        # Needs to be `lax` instead of `strict` to get FireFox to send the
-        # session cookie when navigating back from GitHub's login. (Tested
-        # with FF 88)
-        cookie["session_id"]["samesite"] = "lax"
-        cookie["session_id"]["path"] = "/"
+    @classmethod
+    def from_record(
+        cls,
+        row: t.Mapping[str, t.Any],
+        session_id: uuid.UUID,
+        status: SessionStatus,
+    ) -> Session:
+        return cls(
+            user_id=row["user_id"],
+            session_id=session_id,
+            created_at=row["created_at"],
+            expires_at=row["expires_at"],
+            status=status,
+        )
 
-        return cookie.output(header="")
+    def as_cookie(self) -> str:
+        expires = email.utils.format_datetime(
+            self.expires_at.astimezone(datetime.timezone.utc), usegmt=True
+        )
+        return COOKIE_TEMPLATE.format(
+            session_id=self.session_id.hex, expires=expires
+        )
 
     @staticmethod
     async def authenticated(
@@ -88,7 +152,10 @@ class Session(NewSession):
         conn: Connection = Depends(Postgres.connection),
         session_id: t.Optional[str] = Cookie(None),
     ) -> t.Union[SessionProblem, Session]:
-        logger.info(f"Received cookie {session_id}")
+        logger.info(
+            "Received session cookie",
+            extra={"event": "session.cookie", "session_id": session_id},
+        )
 
         if session_id is None:
             return SessionProblem.MISSING
@@ -99,7 +166,7 @@ class Session(NewSession):
             return SessionProblem.INVALID
 
         query = """
-            SELECT user_id, created_at, expires_at, status FROM sessions
+            SELECT user_id, created_at, expires_at FROM sessions
             WHERE session_id = $1 AND status = 'valid';"""
 
         row = await conn.fetchrow(query, session_id_uuid)
@@ -107,10 +174,85 @@ class Session(NewSession):
         if row is None:
             return SessionProblem.INVALID
 
-        session = Session(**{"session_id": session_id_uuid, **dict(row)})
+        # The query only matches valid sessions.
+        session = Session.from_record(
+            row, session_id_uuid, SessionStatus.VALID
+        )
 
         now = datetime.datetime.now(datetime.timezone.utc)
         if session.expires_at <= now:
             return SessionProblem.EXPIRED
 
         return session
+
+
+class PendingSession(t.NamedTuple):
+    session_id: uuid.UUID
+    user_id: int
+    # Connection of the request creating the session. A batch is
+    # inserted on the connection of its first session. That request is
+    # waiting on the batch, even when it is cancelled, so this doesn't
+    # need another connection from the pool, which could deadlock when
+    # all of them are held by requests waiting on the batch.
+    conn: Connection
+
+
+async def insert_sessions(
+    pending: t.List[PendingSession],
+) -> t.Dict[PendingSession, Session]:
+    # Session ids are generated up front so each row can be matched to
+    # the caller it belongs to.
+    query = """
+        INSERT INTO sessions (session_id, user_id, status)
+        SELECT session_id, user_id, $3::session_status
+        FROM unnest($1::uuid[], $2::bigint[]) AS new (session_id, user_id)
+        RETURNING session_id, user_id, created_at, expires_at"""
+
+    status = SessionStatus.VALID
+    rows = await pending[0].conn.fetch(
+        query,
+        [session.session_id for session in pending],
+        [session.user_id for session in pending],
+        status.value,
+    )
+
+    by_id = {session.session_id: session for session in pending}
+    return {
+        by_id[row["session_id"]]: Session.from_record(
+            row, row["session_id"], status
+        )
+        for row in rows
+    }
+
+
+# Holds the batcher for session inserts when enabled.
+class SessionBatch:
+    _batched: t.Optional[Batched[PendingSession, Session]] = None
+
+    @staticmethod
+    def start(config: SessionConfig, pool_size: int) -> None:
+        if not config.batch_inserts:
+            return
+
+        # Every session in a batch holds a connection until the batch is
+        # done, so larger batches can never fill up.
+        max_batch_size = config.batch_max_size or pool_size
+        if max_batch_size > pool_size:
+            raise ValueError(
+                f"batch_max_size must be at most the pool size {pool_size},"
+                f" got {max_batch_size}"
+            )
+
+        SessionBatch._batched = Batched(
+            insert_sessions,
+            max_batch_size=max_batch_size,
+            window=config.batch_window,
+        )
+
+    @staticmethod
+    def stop() -> None:
+        SessionBatch._batched = None
+
+    @staticmethod
+    def batched() -> t.Optional[Batched[PendingSession, Session]]:
+        return SessionBatch._batched
@@ -0,0 +1,337 @@
+"""
+Static assets with fingerprinted names and precompressed variants.
+
+`build` copies `static/` into a build directory. Every file is written
+under its own name and under a fingerprinted name (`app.3f2a9c1e.js`),
+next to `.gz` and `.br` variants where compressing makes it smaller.
+`manifest.json` maps the original names to the fingerprinted ones.
+References in HTML (`src`, `href`) and CSS (`url()`) to other files in
+`static/` are rewritten to their fingerprinted names, so pages only
+point at names that can be cached forever.
+
+`StaticAssets` serves the build directory. It picks the best variant
+the client accepts, marks fingerprinted files as immutable so browsers
+never ask for them again and keeps small files in memory, up to a total
+budget, so hot assets don't touch the disk. Original names, such as the
+HTML pages themselves, are served with `no-cache`, so clients
+revalidate them with the ETag.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import typing as t
+import urllib.parse
+from pathlib import Path
+
+import brotli  # type: ignore
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from api.utils import ignore_exc
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+# Where the app mounts the static files.
+URL_PREFIX = "/static"
+
+# Not worth compressing, the headers and CPU time eat the savings.
+MIN_COMPRESS_SIZE = 256
+
+# Files up to this size are kept in memory by `StaticAssets`, until they
+# add up to the total.
+MAX_CACHED_SIZE = 256 * 1024
+MAX_CACHED_TOTAL = 32 * 1024 * 1024
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first. File suffix of each encoding's variant in the build.
+ENCODINGS = {"br": ".br", "gzip": ".gz", "identity": ""}
+
+
+def fingerprinted(path: Path, content: bytes) -> Path:
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+
+# Patterns for the references to rewrite, by suffix. Files are built in
+# this order, after all others, so the files they reference already
+# have their fingerprint. Pages link to stylesheets, not the other way
+# around.
+REFERENCES = {
+    ".css": re.compile(r"""url\(\s*(["']?)(?P<url>[^"')]+)\1\s*\)"""),
+    ".html": re.compile(r"""\b(?:src|href)\s*=\s*(["'])(?P<url>[^"']+)\1"""),
+}
+
+
+def build_order(path: Path) -> t.Tuple[int, Path]:
+    order = list(REFERENCES)
+    return (order.index(path.suffix) + 1 if path.suffix in order else 0, path)
+
+
+def resolve(url: str, name: str) -> t.Optional[str]:
+    """
+    Name in `static/` of the file `url` points at, when found in the
+    file `name`. `None` for URLs outside of `static/`.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    prefix = f"{URL_PREFIX}/"
+    if parts.path.startswith(prefix):
+        return parts.path.replace(prefix, "", 1)
+    if parts.path.startswith("/"):
+        return None
+    return posixpath.normpath(
+        posixpath.join(posixpath.dirname(name), parts.path)
+    )
+
+
+def rewrite_references(
+    content: bytes, name: str, manifest: t.Mapping[str, str]
+) -> bytes:
+    pattern = REFERENCES.get(posixpath.splitext(name)[1])
+    if pattern is None:
+        return content
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content
+
+    def fingerprint_url(match: t.Match[str]) -> str:
+        key = resolve(match["url"], name)
+        if key is None or key not in manifest:
+            return match[0]
+
+        # Fingerprinted files sit next to the original, so swapping the
+        # file name works for absolute and relative URLs alike.
+        parts = urllib.parse.urlsplit(match["url"])
+        directory = parts.path.rpartition("/")[0]
+        path = posixpath.join(directory, posixpath.basename(manifest[key]))
+        url = urllib.parse.urlunsplit(parts._replace(path=path))
+
+        start = match.start("url") - match.start()
+        end = match.end("url") - match.start()
+        return match[0][:start] + url + match[0][end:]
+
+    return pattern.sub(fingerprint_url, text).encode("utf-8")
+
+
+def compress(content: bytes) -> t.Dict[str, bytes]:
+    if len(content) < MIN_COMPRESS_SIZE:
+        return {}
+
+    variants = {
+        "br": brotli.compress(content, quality=11),
+        "gzip": gzip.compress(content, compresslevel=9, mtime=0),
+    }
+    return {
+        encoding: compressed
+        for encoding, compressed in variants.items()
+        if len(compressed) < len(content)
+    }
+
+
+def build(source: Path, target: Path) -> t.Dict[str, str]:
+    """
+    Build the static assets in `source` into `target`. Removes whatever
+    was in `target` before. Returns the manifest.
+    """
+    if target.exists():
+        shutil.rmtree(target)
+
+    manifest: t.Dict[str, str] = {}
+    for path in sorted(source.rglob("*"), key=build_order):
+        if not path.is_file():
+            continue
+
+        name = path.relative_to(source)
+        content = rewrite_references(
+            path.read_bytes(), name.as_posix(), manifest
+        )
+        fingerprint = fingerprinted(name, content)
+        manifest[name.as_posix()] = fingerprint.as_posix()
+
+        (target / name).parent.mkdir(parents=True, exist_ok=True)
+        (target / name).write_bytes(content)
+        (target / fingerprint).write_bytes(content)
+        for encoding, compressed in compress(content).items():
+            suffix = ENCODINGS[encoding]
+            (target / f"{fingerprint}{suffix}").write_bytes(compressed)
+
+    (target / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    logger.info("Built %d static assets into %s", len(manifest), target)
+    return manifest
+
+
+def is_stale(source: Path, target: Path) -> bool:
+    """
+    Whether a file in `source` changed after `target` was built.
+    """
+    built_at = (target / MANIFEST).stat().st_mtime
+    return any(
+        path.stat().st_mtime > built_at
+        for path in source.rglob("*")
+        if path.is_file()
+    )
+
+
+@dataclasses.dataclass
+class Variant:
+    path: Path
+    size: int
+    etag: str
+    # Only set for files kept in memory.
+    content: t.Optional[bytes]
+
+
+@dataclasses.dataclass
+class Asset:
+    media_type: str
+    cache_control: str
+    # By encoding, in order of preference.
+    variants: t.Dict[str, Variant]
+
+
+def accepted_encodings(headers: Headers) -> t.Set[str]:
+    """
+    Encodings from the `Accept-Encoding` header that don't have `q=0`.
+    We only have one variant per encoding, so the order we prefer them
+    in wins over the client's weights.
+    """
+    accepted = set()
+    refused = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        encoding, *params = [param.strip() for param in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                quality = ignore_exc(float, ValueError, value) or 0.0
+        if encoding and quality > 0:
+            accepted.add(encoding.lower())
+        elif encoding:
+            refused.add(encoding.lower())
+
+    # `*` only stands for the encodings the client didn't mention.
+    if "*" in accepted:
+        accepted.update(set(ENCODINGS) - refused)
+    return accepted - refused
+
+
+class StaticAssets(StaticFiles):
+    """
+    Serve a directory made by `build`. Paths that are not in the
+    manifest fall back to the regular `StaticFiles` behaviour.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: Path,
+        html: bool = False,
+        max_cached_size: int = MAX_CACHED_SIZE,
+        max_cached_total: int = MAX_CACHED_TOTAL,
+    ) -> None:
+        super().__init__(directory=directory, html=html)
+        self.max_cached_size = max_cached_size
+        self.max_cached_total = max_cached_total
+        self.cached_total = 0
+        self.manifest: t.Dict[str, str] = json.loads(
+            (directory / MANIFEST).read_text()
+        )
+
+        self.assets: t.Dict[str, Asset] = {}
+        for name, fingerprint in self.manifest.items():
+            variants = self.load_variants(directory / fingerprint)
+            media_type = mimetypes.guess_type(name)[0] or "text/plain"
+            self.assets[os.path.normpath(name)] = Asset(
+                media_type, REVALIDATE, variants
+            )
+            self.assets[os.path.normpath(fingerprint)] = Asset(
+                media_type, IMMUTABLE, variants
+            )
+
+    def load_variants(self, path: Path) -> t.Dict[str, Variant]:
+        variants = {}
+        for encoding, suffix in ENCODINGS.items():
+            variant_path = path.with_name(path.name + suffix)
+            if not variant_path.exists():
+                continue
+
+            size = variant_path.stat().st_size
+            content = None
+            if (
+                size <= self.max_cached_size
+                and self.cached_total + size <= self.max_cached_total
+            ):
+                content = variant_path.read_bytes()
+                self.cached_total += size
+            # The fingerprinted name changes whenever the content does.
+            etag = f'"{path.name}-{encoding}"'
+            variants[encoding] = Variant(variant_path, size, etag, content)
+        return variants
+
+    def lookup_asset(self, path: str, scope: Scope) -> t.Optional[Asset]:
+        if asset := self.assets.get(path):
+            return asset
+        # Directory index. Without the trailing slash, let `StaticFiles`
+        # redirect first.
+        if self.html and (path == "." or scope["path"].endswith("/")):
+            return self.assets.get(os.path.normpath(f"{path}/index.html"))
+        return None
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        asset = self.lookup_asset(path, scope)
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers)
+        # The uncompressed variant is always there. Use it even when the
+        # client says it doesn't want it, there is nothing else to send.
+        encoding, variant = next(
+            (
+                (encoding, variant)
+                for encoding, variant in asset.variants.items()
+                if encoding in accepted
+            ),
+            ("identity", asset.variants["identity"]),
+        )
+
+        headers = {
+            "cache-control": asset.cache_control,
+            "etag": variant.etag,
+            "vary": "accept-encoding",
+        }
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+
+        if request_headers.get("if-none-match") == variant.etag:
+            return Response(status_code=304, headers=headers)
+
+        if variant.content is not None:
+            return Response(
+                variant.content, headers=headers, media_type=asset.media_type
+            )
+
+        return FileResponse(
+            variant.path,
+            headers=headers,
+            media_type=asset.media_type,
+            method=scope["method"],
+        )
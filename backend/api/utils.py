@@ -1,9 +1,14 @@
+from __future__ import annotations
+
+import asyncio
 import typing as t
 
 from funcy import partial  # type: ignore
 
 T = t.TypeVar("T")
 S = t.TypeVar("S")
+K = t.TypeVar("K", bound=t.Hashable)
+V = t.TypeVar("V")
 
 
 def maybe(func: t.Callable[[S], T], val: t.Optional[S]) -> t.Optional[T]:
@@ -37,3 +42,204 @@ def maybe_ignore_exc(
     Returns `None` if `val` is `None`, or `func` raises `exc`.
     """
     return maybe(partial(ignore_exc, func, exc), val)
+
+
+async def amaybe(
+    func: t.Callable[[S], t.Awaitable[T]], val: t.Optional[S]
+) -> t.Optional[T]:
+    """
+    Async version of `maybe`. If `val` is `None`, return `None`.
+    Otherwise await `func(val)`.
+    """
+    if val is None:
+        return None
+
+    return await func(val)
+
+
+async def aignore_exc(
+    func: t.Callable[[S], t.Awaitable[T]], exc: t.Type[BaseException], val: S
+) -> t.Optional[T]:
+    """
+    Async version of `ignore_exc`. Await `func(val)`, returning `None`
+    if exception `exc` is raised.
+    """
+    try:
+        return await func(val)
+    except exc:
+        return None
+
+
+async def with_timeout(
+    seconds: float, awaitable: t.Awaitable[T]
+) -> t.Optional[T]:
+    """
+    Await `awaitable`, returning `None` if it does not complete within
+    `seconds`. The awaitable is cancelled on timeout.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout=seconds)
+    except asyncio.TimeoutError:
+        return None
+
+
+async def gather_limited(
+    limit: int, awaitables: t.Iterable[t.Awaitable[T]]
+) -> t.List[T]:
+    """
+    Like `asyncio.gather`, but run at most `limit` of the `awaitables`
+    at the same time. Results are returned in the order of `awaitables`.
+
+    If one of the awaitables raises, the ones that are still running
+    are cancelled and the exception propagates.
+    """
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable: t.Awaitable[T]) -> T:
+        async with semaphore:
+            return await awaitable
+
+    awaitables = list(awaitables)
+    tasks = [asyncio.ensure_future(run(aw)) for aw in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Retrieves the exceptions of the other tasks that failed.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Tasks cancelled before they got the semaphore never started
+        # their coroutine. Closing finished ones does nothing.
+        for awaitable in awaitables:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+
+
+class Batched(t.Generic[K, V]):
+    """
+    Collect `load` calls made by concurrent coroutines and serve them
+    with a single call to `load_many`, in the style of DataLoader.
+
+    Keys requested during one iteration of the event loop end up in the
+    same batch. With a `window`, the batch stays open for that many
+    seconds after its first key instead. A batch is sent early once it
+    holds `max_batch_size` keys. Keys that are already pending or being
+    loaded are not loaded again.
+
+    `load_many` gets the list of unique keys and returns a mapping from
+    key to value; keys that are missing from the mapping load as
+    `None`. If `load_many` raises, every caller in that batch gets the
+    exception. If it is cancelled, so are they.
+
+    Typical use is turning many single-row lookups into one query:
+
+        async def load_users(ids):
+            rows = await conn.fetch(
+                "SELECT * FROM users WHERE user_id = ANY($1)", ids
+            )
+            return {row["user_id"]: row for row in rows}
+
+        users = Batched(load_users)
+        await asyncio.gather(users.load(1), users.load(2))
+    """
+
+    def __init__(
+        self,
+        load_many: t.Callable[[t.List[K]], t.Awaitable[t.Mapping[K, V]]],
+        max_batch_size: t.Optional[int] = None,
+        window: float = 0.0,
+    ) -> None:
+        if max_batch_size is not None and max_batch_size < 1:
+            raise ValueError(
+                f"max_batch_size must be at least 1, got {max_batch_size}"
+            )
+        if window < 0:
+            raise ValueError(f"window must not be negative, got {window}")
+
+        self._load_many = load_many
+        self._max_batch_size = max_batch_size
+        self._window = window
+        self._pending: t.Dict[K, asyncio.Future[t.Optional[V]]] = {}
+        self._loading: t.Dict[K, asyncio.Future[t.Optional[V]]] = {}
+        self._scheduled: t.Optional[asyncio.Handle] = None
+        # The event loop only keeps weak references to tasks.
+        self._inflight: t.Set[asyncio.Future[None]] = set()
+
+    async def load(self, key: K) -> t.Optional[V]:
+        future = self._pending.get(key) or self._loading.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+
+            if self._scheduled is None and self._window > 0:
+                self._scheduled = loop.call_later(self._window, self._dispatch)
+            elif self._scheduled is None:
+                self._scheduled = loop.call_soon(self._dispatch)
+            if len(self._pending) == self._max_batch_size:
+                self._dispatch()
+
+        # Shield the shared future so a cancelled caller doesn't cancel
+        # the load for everyone else waiting on the same key.
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+
+        batch, self._pending = self._pending, {}
+        self._loading.update(batch)
+        task = asyncio.ensure_future(self._resolve(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _resolve(
+        self, batch: t.Dict[K, asyncio.Future[t.Optional[V]]]
+    ) -> None:
+        try:
+            values = await self._load_many(list(batch))
+        except Exception as exc:  # pylint: disable=broad-except
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(values.get(key))
+        finally:
+            for key in batch:
+                del self._loading[key]
+            # `CancelledError` is not an `Exception`. Cancel the callers
+            # instead of leaving them waiting forever.
+            for future in batch.values():
+                if not future.done():
+                    future.cancel()
+
+
+def batched(
+    max_batch_size: t.Optional[int] = None, window: float = 0.0
+) -> t.Callable[
+    [t.Callable[[t.List[K]], t.Awaitable[t.Mapping[K, V]]]], Batched[K, V]
+]:
+    """
+    Decorator version of `Batched`. Turns a bulk loading function into a
+    loader with a `load(key)` method.
+
+        @batched(max_batch_size=100)
+        async def users(ids):
+            ...
+
+        user = await users.load(42)
+    """
+
+    def wrap(
+        load_many: t.Callable[[t.List[K]], t.Awaitable[t.Mapping[K, V]]],
+    ) -> Batched[K, V]:
+        return Batched(load_many, max_batch_size=max_batch_size, window=window)
+
+    return wrap
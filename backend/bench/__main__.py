@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+import os
+import pathlib
+import sys
+
+import typer
+
+PROJECT_ROOT = pathlib.Path(os.environ["PROJECT_ROOT"])
+sys.path.append(str(PROJECT_ROOT / "backend"))
+
+# pylint: disable=wrong-import-position
+from bench import (  # noqa: E402
+    bench_executor,
+    bench_logs,
+    bench_profiler,
+    bench_session,
+    bench_sessions,
+    bench_static,
+    bench_utils,
+)
+
+cli = typer.Typer()
+
+
+@cli.command()
+def utils(keys: int = 200, latency_ms: float = 1.0) -> None:
+    bench_utils.run(keys=keys, latency=latency_ms / 1000)
+
+
+@cli.command()
+def session(iterations: int = 10_000) -> None:
+    bench_session.run(iterations=iterations)
+
+
+@cli.command()
+def sessions(
+    logins: int = 1000,
+    db_latency_ms: float = 1.0,
+    commit_ms: float = 0.5,
+    window_ms: float = 1.0,
+) -> None:
+    bench_sessions.run(
+        logins=logins,
+        latency=db_latency_ms / 1000,
+        commit=commit_ms / 1000,
+        window=window_ms / 1000,
+    )
+
+
+@cli.command()
+def logs(requests: int = 1000) -> None:
+    bench_logs.run(requests=requests)
+
+
+@cli.command()
+def static(rounds: int = 100) -> None:
+    bench_static.run(rounds=rounds)
+
+
+@cli.command()
+def profiler(requests: int = 200, runs: int = 30) -> None:
+    bench_profiler.run(requests=requests, runs=runs)
+
+
+@cli.command()
+def executor(
+    logins: int = 20,
+    probes: int = 50,
+    db_latency_ms: float = 1.0,
+    github_latency_ms: float = 5.0,
+) -> None:
+    bench_executor.run(
+        logins=logins,
+        probes=probes,
+        db_latency=db_latency_ms / 1000,
+        github_latency=github_latency_ms / 1000,
+    )
+
+
+if __name__ == "__main__":
+    cli()
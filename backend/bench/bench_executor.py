@@ -0,0 +1,116 @@
+"""
+`/app` latency while `/login` and the GitHub callback are hammered on
+the same event loop. The handlers are stand-ins that do the same work
+as the real ones: Fernet for the OAuth state, pydantic validation of
+the GitHub responses and a (simulated, blocking) GitHub round trip.
+Postgres is simulated with a sleep.
+
+"inline (before)" runs everything on the event loop, as the app used
+to. The other rows offload the crypto with `Executor` and the GitHub
+calls with `run_in_threadpool`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import typing as t
+
+from cryptography.fernet import Fernet
+from starlette.concurrency import run_in_threadpool
+
+from api.app import State, StateEncryption, decrypt_state, encrypt_state
+from api.executor import Executor, ExecutorConfig, ExecutorKind
+from api.github import GitHubToken, GitHubUser
+from bench.harness import Result, report
+
+TOKEN: t.Dict[str, t.Any] = {
+    "access_token": "ghu_" + "x" * 36,
+    "expires_in": 28800,
+    "refresh_token": "ghr_" + "x" * 72,
+    "refresh_token_expires_in": 15897600,
+}
+USER: t.Dict[str, t.Any] = {
+    "id": 1,
+    "login": "octocat",
+    "avatar_url": "https://example.com/a",
+}
+USERS = {"users": [{"user_id": i, "username": f"user{i}"} for i in range(50)]}
+
+
+def fetch_github(latency: float) -> t.Tuple[GitHubToken, GitHubUser]:
+    time.sleep(latency)
+    return GitHubToken(**TOKEN), GitHubUser(**USER)
+
+
+async def get_app(db_latency: float) -> None:
+    await asyncio.sleep(db_latency)
+    json.dumps(USERS)
+
+
+async def login_inline(github_latency: float) -> None:
+    state = encrypt_state(State(redirect="/"))
+    decrypt_state(state)
+    fetch_github(github_latency)
+
+
+async def login_offloaded(github_latency: float) -> None:
+    state = await State(redirect="/").encrypt()
+    await State.decrypt(state)
+    await run_in_threadpool(fetch_github, github_latency)
+
+
+def run(
+    logins: int, probes: int, db_latency: float, github_latency: float
+) -> None:
+    key = Fernet.generate_key()
+
+    async def scenario(
+        name: str,
+        login: t.Callable[[float], t.Awaitable[None]],
+        kind: ExecutorKind,
+    ) -> Result:
+        Executor.start(
+            ExecutorConfig(kind=kind),
+            initializer=StateEncryption.init,
+            initargs=(key,),
+        )
+        stop = asyncio.Event()
+
+        async def login_worker() -> None:
+            while not stop.is_set():
+                await login(github_latency)
+                # Requests are separate tasks, the loop gets a turn in
+                # between even when the handler never awaits.
+                await asyncio.sleep(0)
+
+        workers = [
+            asyncio.ensure_future(login_worker()) for _ in range(logins)
+        ]
+        # Let the login traffic get going.
+        await asyncio.sleep(0.1)
+
+        latencies = []
+        for _ in range(probes):
+            start = time.perf_counter()
+            await get_app(db_latency)
+            latencies.append(time.perf_counter() - start)
+
+        stop.set()
+        await asyncio.gather(*workers)
+        Executor.shutdown()
+        return Result(name, latencies)
+
+    scenarios = [
+        ("inline (before)", login_inline, ExecutorKind.INLINE),
+        ("thread executor", login_offloaded, ExecutorKind.THREAD),
+        ("process executor", login_offloaded, ExecutorKind.PROCESS),
+    ]
+    results = [
+        asyncio.run(scenario(name, login, kind))
+        for name, login, kind in scenarios
+    ]
+
+    print(f"/app latency with {logins} concurrent logins")
+    report(results)
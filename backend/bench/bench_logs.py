@@ -0,0 +1,75 @@
+"""
+Logging overhead per request, as seen by the request handler. "Before"
+is the previous setup: a synchronous stream handler with eager
+f-strings. "After" is `api.logs.queue_handler` with sampling. Both
+write to /dev/null so the terminal doesn't skew the numbers.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import uuid
+
+from api.logs import LogConfig, SampleFilter, queue_handler
+from bench.harness import measure, report
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def run(requests: int) -> None:
+    session_id = uuid.uuid4()
+    devnull = open(  # pylint: disable=consider-using-with
+        os.devnull, "w", encoding="utf-8"
+    )
+
+    sync_handler = logging.StreamHandler(devnull)
+    sync_handler.setFormatter(
+        logging.Formatter("[%(name)s] %(levelname)s %(message)s")
+    )
+    before = make_logger("bench.before", sync_handler)
+
+    logs = LogConfig()
+    handler = queue_handler(redact=logs.redact, stream=devnull)
+    handler.addFilter(SampleFilter(logs.sample_rates))
+    after = make_logger("bench.after", handler)
+
+    # pylint: disable=logging-fstring-interpolation
+    def sync_f_strings() -> None:
+        for _ in range(requests):
+            before.info(f"Received cookie {session_id.hex}")
+            before.info(f"{session_id}")
+
+    def queued_sampled() -> None:
+        for _ in range(requests):
+            after.info(
+                "Received session cookie",
+                extra={"event": "session.cookie", "session_id": session_id},
+            )
+            after.info(
+                "Listing users for user %s",
+                42,
+                extra={"event": "app.request", "session_id": session_id},
+            )
+
+    def queued_unsampled() -> None:
+        for _ in range(requests):
+            after.info(
+                "Received session cookie", extra={"session_id": session_id}
+            )
+            after.info("Listing users for user %s", 42)
+
+    print(f"Logging for {requests} requests, two log calls per request")
+    report(
+        [
+            measure("sync stream, f-strings (before)", sync_f_strings),
+            measure("queue, sampled", queued_sampled),
+            measure("queue, unsampled", queued_unsampled),
+        ]
+    )
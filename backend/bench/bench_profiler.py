@@ -0,0 +1,94 @@
+"""
+Overhead of the sampling profiler. Runs a batch of concurrent fake
+requests that mix CPU work (JSON encoding) with awaits, through
+`ProfilerMiddleware`, with the profiler off and on.
+
+Measures process CPU time, which includes the sampler thread, and
+interleaves the configurations so noise from the rest of the machine
+hits all of them alike.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import pathlib
+import tempfile
+import time
+import typing as t
+
+from api.profiler import (
+    OVERHEAD_BUDGET,
+    Profiler,
+    ProfilerConfig,
+    ProfilerMiddleware,
+)
+from bench.harness import Result, report
+
+PAYLOAD = {
+    "users": [{"user_id": i, "username": f"user{i}"} for i in range(200)]
+}
+
+# Sampling interval per configuration, `None` is off.
+INTERVALS = {
+    "profiler off": None,
+    "profiler on, 100 Hz": 0.01,
+    "profiler on, 1000 Hz": 0.001,
+}
+
+
+async def receive() -> t.MutableMapping[str, t.Any]:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(_message: t.MutableMapping[str, t.Any]) -> None:
+    pass
+
+
+async def endpoint(_scope: t.Any, _receive: t.Any, _send: t.Any) -> None:
+    for _ in range(5):
+        json.dumps(PAYLOAD)
+        await asyncio.sleep(0)
+
+
+def run(requests: int, runs: int) -> None:
+    middleware = ProfilerMiddleware(endpoint)
+    scope = {"type": "http", "method": "GET", "path": "/app"}
+
+    async def batch(
+        interval: t.Optional[float], output_dir: pathlib.Path
+    ) -> float:
+        if interval is not None:
+            Profiler.start(
+                ProfilerConfig(interval=interval, output_dir=output_dir)
+            )
+        try:
+            start = time.process_time()
+            await asyncio.gather(
+                *(middleware(scope, receive, send) for _ in range(requests))
+            )
+            return time.process_time() - start
+        finally:
+            if interval is not None:
+                Profiler.stop()
+
+    async def main(output_dir: pathlib.Path) -> t.List[Result]:
+        results = [Result(name, []) for name in INTERVALS]
+        for _ in range(runs):
+            for result, interval in zip(results, INTERVALS.values()):
+                result.samples.append(await batch(interval, output_dir))
+        return results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = asyncio.run(main(pathlib.Path(tmp)))
+
+    print(f"CPU time for {requests} concurrent requests, {runs} runs")
+    report(results)
+
+    off, on = results[0].percentile(50), results[1].percentile(50)
+    overhead = on / off - 1
+    verdict = "within" if overhead <= OVERHEAD_BUDGET else "OVER"
+    print(
+        f"\nMedian overhead at 100 Hz: {overhead:.1%},"
+        f" {verdict} the {OVERHEAD_BUDGET:.0%} budget"
+    )
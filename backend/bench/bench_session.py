@@ -0,0 +1,87 @@
+"""
+Per-request session overhead: building a `Session` from a database row
+and rendering the session cookie. The "before" variants reproduce the
+pydantic model and `SimpleCookie` code the app used previously.
+"""
+
+from __future__ import annotations
+
+import datetime
+import http.cookies
+import typing as t
+import uuid
+
+from pydantic import BaseModel
+
+from api.session import Session, SessionStatus
+from bench.harness import measure, report
+
+
+# pylint: disable=duplicate-code
+class PydanticSession(BaseModel):
+    user_id: int
+    session_id: uuid.UUID
+    created_at: datetime.datetime
+    expires_at: datetime.datetime
+    status: SessionStatus
+
+    def as_cookie(self) -> str:
+        cookie: http.cookies.SimpleCookie = http.cookies.SimpleCookie()
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        expires = (self.expires_at - now).total_seconds()
+
+        cookie["session_id"] = self.session_id.hex
+        cookie["session_id"]["expires"] = expires
+        cookie["session_id"]["httponly"] = True
+        cookie["session_id"]["secure"] = True
+        cookie["session_id"]["samesite"] = "lax"
+        cookie["session_id"]["path"] = "/"
+
+        return cookie.output(header="")
+
+
+def run(iterations: int) -> None:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    session_id = uuid.uuid4()
+    row: t.Dict[str, t.Any] = {
+        "user_id": 42,
+        "created_at": now,
+        "expires_at": now + datetime.timedelta(days=1),
+        "status": "valid",
+    }
+
+    def load_pydantic() -> None:
+        for _ in range(iterations):
+            PydanticSession(**{"session_id": session_id, **dict(row)})
+
+    def load_slotted() -> None:
+        for _ in range(iterations):
+            Session.from_record(row, session_id, SessionStatus.VALID)
+
+    print(f"Build session from row, {iterations} iterations")
+    report(
+        [
+            measure("pydantic model (before)", load_pydantic),
+            measure("slotted class", load_slotted),
+        ]
+    )
+
+    pydantic_session = PydanticSession(session_id=session_id, **row)
+    session = Session.from_record(row, session_id, SessionStatus.VALID)
+
+    def cookie_simple_cookie() -> None:
+        for _ in range(iterations):
+            pydantic_session.as_cookie()
+
+    def cookie_template() -> None:
+        for _ in range(iterations):
+            session.as_cookie()
+
+    print(f"\nRender session cookie, {iterations} iterations")
+    report(
+        [
+            measure("SimpleCookie (before)", cookie_simple_cookie),
+            measure("template", cookie_template),
+        ]
+    )
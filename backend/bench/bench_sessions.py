@@ -0,0 +1,103 @@
+"""
+Login throughput with and without batching the session inserts, see
+`SessionConfig.batch_inserts`. A login is the database part of the
+GitHub callback: upsert the user, then create the session, on one
+connection from a pool of 10.
+
+Every statement costs a round trip plus a commit. Commits are
+serialized across connections, standing in for the WAL flush, so
+batching turns one commit per session into one per batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import typing as t
+import uuid
+
+from api.postgres import Connection
+from api.session import NewSession, SessionBatch, SessionConfig
+from bench.fakes import FakeConnection, FakePool
+from bench.harness import measure_async, report
+
+POOL_SIZE = 10
+
+
+class SessionsConnection(FakeConnection):
+    def __init__(self, latency: float, commit: float) -> None:
+        super().__init__(latency)
+        self.commit = commit
+        # When the last commit queued so far is flushed.
+        self._flushed_at = 0.0
+
+    async def fetch(  # pylint: disable=arguments-differ
+        self, query: str, *args: t.Any
+    ) -> t.List[t.Any]:
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        # Queue behind the other commits without sleeping once per
+        # commit, short sleeps overshoot too much for that.
+        now = asyncio.get_running_loop().time()
+        self._flushed_at = max(now, self._flushed_at) + self.commit
+        await asyncio.sleep(self._flushed_at - now)
+
+        if "unnest" in query:
+            return [
+                session_row(session_id, user_id)
+                for session_id, user_id in zip(args[0], args[1])
+            ]
+        return [session_row(uuid.uuid4(), args[0])]
+
+    async def fetchval(self, query: str, *args: t.Any) -> t.Any:
+        rows = await self.fetch(query, *args)
+        return rows[0]["user_id"]
+
+
+def session_row(session_id: uuid.UUID, user_id: t.Any) -> t.Dict[str, t.Any]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "created_at": now,
+        "expires_at": now + datetime.timedelta(days=1),
+    }
+
+
+def run(logins: int, latency: float, commit: float, window: float) -> None:
+    async def login_storm(config: SessionConfig) -> None:
+        pool = FakePool(size=POOL_SIZE, latency=latency)
+        pool.conn = SessionsConnection(latency, commit)
+        SessionBatch.start(config, POOL_SIZE)
+
+        async def login(user_id: int) -> None:
+            async with pool.acquire() as fake:
+                conn = t.cast(Connection, fake)
+                user_id = await conn.fetchval(
+                    "INSERT INTO users ... RETURNING user_id", user_id
+                )
+                await NewSession(user_id=user_id).create(conn)
+
+        try:
+            await asyncio.gather(*map(login, range(logins)))
+        finally:
+            SessionBatch.stop()
+
+    def scenario(config: SessionConfig) -> t.Callable[[], t.Awaitable[None]]:
+        return lambda: login_storm(config)
+
+    results = [
+        measure_async(
+            "one insert per session (before)",
+            scenario(SessionConfig(batch_inserts=False)),
+            runs=5,
+        ),
+        measure_async(
+            f"batched, {window * 1000:g}ms window",
+            scenario(SessionConfig(batch_inserts=True, batch_window=window)),
+            runs=5,
+        ),
+    ]
+
+    print(f"{logins} concurrent logins, time until all are done")
+    report(results)
@@ -0,0 +1,75 @@
+"""
+Serve a set of static files with plain `StaticFiles` and with
+`api.static.StaticAssets`. Stdlib sources stand in for JS and CSS,
+since they compress about as well. Reports time per round of requests
+and the bytes sent.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import pathlib
+import tempfile
+import typing as t
+
+from starlette.staticfiles import StaticFiles
+
+from api.static import StaticAssets, build
+from bench.harness import asgi_get, measure_async, report
+
+SOURCES = {
+    "app.js": asyncio.tasks.__file__,
+    "vendor.js": asyncio.base_events.__file__,
+    "style.css": json.decoder.__file__,
+    "index.html": json.__file__,
+}
+
+HEADERS = {"accept-encoding": "gzip, deflate, br"}
+
+
+def run(rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = pathlib.Path(tmp) / "static"
+        source.mkdir()
+        for name, path in SOURCES.items():
+            (source / name).write_bytes(pathlib.Path(path).read_bytes())
+
+        target = pathlib.Path(tmp) / "build"
+        manifest = build(source, target)
+
+        plain = StaticFiles(directory=source)
+        assets = StaticAssets(directory=target)
+
+        def serve(
+            app: t.Any, paths: t.List[str]
+        ) -> t.Callable[[], t.Coroutine[t.Any, t.Any, int]]:
+            async def requests() -> int:
+                sent = 0
+                for _ in range(rounds):
+                    for path in paths:
+                        _, _, body = await asgi_get(app, path, HEADERS)
+                        sent += len(body)
+                return sent
+
+            return requests
+
+        cases = [
+            ("StaticFiles (before)", serve(plain, [f"/{n}" for n in SOURCES])),
+            (
+                "StaticAssets",
+                serve(assets, [f"/{f}" for f in manifest.values()]),
+            ),
+        ]
+
+        print(f"{rounds} rounds of {len(SOURCES)} requests")
+        for name, requests in cases:
+            sent = asyncio.run(requests())
+            print(f"{name}: {sent / rounds / 1024:.1f} KiB sent per round")
+
+        report(
+            [
+                measure_async(name, requests, runs=10)
+                for name, requests in cases
+            ]
+        )
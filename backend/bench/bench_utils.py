@@ -0,0 +1,48 @@
+"""
+Compare looking up many rows with one query per key against batching
+the lookups with `api.utils.Batched`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing as t
+
+from api.utils import Batched
+from bench.fakes import FakePool
+from bench.harness import measure_async, report
+
+
+def run(keys: int, latency: float) -> None:
+    ids = list(range(keys))
+
+    async def one_query_per_key() -> None:
+        pool = FakePool(size=10, latency=latency)
+
+        async def load(key: int) -> t.Any:
+            async with pool.acquire() as conn:
+                return await conn.fetchrow(
+                    "SELECT * FROM users WHERE user_id = $1", key
+                )
+
+        await asyncio.gather(*map(load, ids))
+
+    async def batched() -> None:
+        pool = FakePool(size=10, latency=latency)
+
+        async def load_many(keys: t.List[int]) -> t.Dict[int, t.Any]:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT * FROM users WHERE user_id = ANY($1)", keys
+                )
+            return {row["id"]: row for row in rows}
+
+        loader = Batched(load_many)
+        await asyncio.gather(*map(loader.load, ids))
+
+    report(
+        [
+            measure_async(f"one query per key ({keys})", one_query_per_key),
+            measure_async(f"batched ({keys})", batched),
+        ]
+    )
@@ -0,0 +1,41 @@
+"""
+Stand-ins for asyncpg so benchmarks can run without a database server.
+Every query costs one simulated network round trip, and the pool only
+hands out a limited number of connections, like the real thing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import typing as t
+
+
+class FakeConnection:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.queries = 0
+
+    async def fetch(self, _query: str, *args: t.Any) -> t.List[t.Any]:
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        # Echo back the arguments, one row per element when given a
+        # list (as in `WHERE id = ANY($1)`).
+        if args and isinstance(args[0], list):
+            return [{"id": arg} for arg in args[0]]
+        return [{"id": arg} for arg in args]
+
+    async def fetchrow(self, query: str, *args: t.Any) -> t.Any:
+        rows = await self.fetch(query, *args)
+        return rows[0] if rows else None
+
+
+class FakePool:
+    def __init__(self, size: int, latency: float) -> None:
+        self.conn = FakeConnection(latency)
+        self._semaphore = asyncio.Semaphore(size)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> t.AsyncIterator[FakeConnection]:
+        async with self._semaphore:
+            yield self.conn
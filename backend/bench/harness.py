@@ -0,0 +1,128 @@
+"""
+Tiny benchmark harness. Runs a function a number of times, records how
+long each run took and prints a summary. Kept dependency free on
+purpose so it runs in the same environment as the tests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import statistics
+import time
+import typing as t
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    # Wall clock seconds per run.
+    samples: t.List[float]
+
+    @property
+    def mean(self) -> float:
+        return statistics.mean(self.samples)
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+def measure(
+    name: str, func: t.Callable[[], t.Any], runs: int = 20, warmup: int = 2
+) -> Result:
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    return Result(name=name, samples=samples)
+
+
+async def measure_awaitable(
+    name: str,
+    func: t.Callable[[], t.Awaitable[t.Any]],
+    runs: int = 20,
+    warmup: int = 2,
+) -> Result:
+    """
+    Like `measure_async`, but runs on the current event loop.
+    """
+    for _ in range(warmup):
+        await func()
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+
+    return Result(name=name, samples=samples)
+
+
+def measure_async(
+    name: str,
+    func: t.Callable[[], t.Awaitable[t.Any]],
+    runs: int = 20,
+    warmup: int = 2,
+) -> Result:
+    return asyncio.run(measure_awaitable(name, func, runs, warmup))
+
+
+def report(results: t.Sequence[Result], unit: str = "ms") -> None:
+    scale = {"s": 1.0, "ms": 1e3, "us": 1e6}[unit]
+    baseline = results[0].mean
+
+    print(f"{'name':<32} {'mean':>10} {'p50':>10} {'p99':>10} {'speedup':>8}")
+    for res in results:
+        print(
+            f"{res.name:<32}"
+            f" {res.mean * scale:>8.3f}{unit}"
+            f" {res.percentile(50) * scale:>8.3f}{unit}"
+            f" {res.percentile(99) * scale:>8.3f}{unit}"
+            f" {baseline / res.mean:>7.2f}x"
+        )
+
+
+async def asgi_get(
+    app: t.Callable[..., t.Awaitable[None]],
+    path: str,
+    headers: t.Optional[t.Dict[str, str]] = None,
+) -> t.Tuple[int, t.Dict[str, str], bytes]:
+    """
+    Call an ASGI app in process, without a server. Returns the status,
+    response headers and body.
+    """
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (key.encode("latin-1"), value.encode("latin-1"))
+            for key, value in (headers or {}).items()
+        ],
+    }
+    messages: t.List[t.Dict[str, t.Any]] = []
+
+    async def receive() -> t.Dict[str, t.Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: t.Dict[str, t.Any]) -> None:
+        messages.append(message)
+
+    await app(scope, receive, send)
+
+    start, *body = messages
+    response_headers = {
+        key.decode("latin-1"): value.decode("latin-1")
+        for key, value in start["headers"]
+    }
+    content = b"".join(message.get("body", b"") for message in body)
+    return start["status"], response_headers, content
@@ -0,0 +1,145 @@
+"""
+Database fixtures.
+
+Running the migrations for every test is slow, so we run them once
+into a template database and give every test a fresh copy of it with
+`CREATE DATABASE ... TEMPLATE`. Copying is a file level operation in
+Postgres and takes a fraction of the time of migrating.
+
+The template is named after a hash of the migrations, so it is reused
+across test runs until a migration changes. Creating a new template
+drops the ones for older migrations. Test databases are named after
+the process, so `pytest -n auto` (pytest-xdist) can run tests in
+parallel against the same server.
+
+Tests that use the `postgres` fixture are skipped when no Postgres
+server is reachable. Start one with `db-server`.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import os
+import pathlib
+import typing as t
+
+import asyncpg  # type: ignore
+import pytest
+from pydantic import ValidationError
+
+from api.postgres import PostgresConfig, connect, migrate, read_migrations
+
+# Fixtures are passed in as arguments named after the fixture.
+# pylint: disable=redefined-outer-name
+
+PROJECT_ROOT = pathlib.Path(os.environ["PROJECT_ROOT"])
+
+# Arbitrary key for `pg_advisory_lock`. Serializes template creation
+# between test processes.
+TEMPLATE_LOCK = 4_815_162_342
+
+database_ids = itertools.count()
+
+
+def template_name(postgres: PostgresConfig) -> str:
+    digest = hashlib.sha256()
+    for migration in read_migrations(postgres):
+        digest.update(migration.encode("utf-8"))
+    return f"test_template_{digest.hexdigest()[:12]}"
+
+
+async def drop_stale_templates(conn: asyncpg.Connection, keep: str) -> None:
+    query = """
+        SELECT datname FROM pg_database
+        WHERE datname LIKE 'test\\_template\\_%' AND datname <> $1"""
+
+    for row in await conn.fetch(query, keep):
+        name = row["datname"]
+        # Postgres refuses to drop template databases.
+        await conn.execute(f'ALTER DATABASE "{name}" IS_TEMPLATE false')
+        try:
+            await conn.execute(f'DROP DATABASE "{name}"')
+        except asyncpg.ObjectInUseError:
+            # Still being copied by a test run of an older checkout.
+            # The next run drops it.
+            pass
+
+
+async def create_template(postgres: PostgresConfig, name: str) -> None:
+    conn = await connect(postgres)
+    try:
+        await conn.execute("SELECT pg_advisory_lock($1)", TEMPLATE_LOCK)
+
+        exists = await conn.fetchval(
+            "SELECT 1 FROM pg_database WHERE datname = $1", name
+        )
+        if exists:
+            return
+
+        await drop_stale_templates(conn, name)
+
+        # Build under a temporary name and rename when done, so an
+        # interrupted run never leaves a half migrated template behind.
+        building = f"{name}_building"
+        await conn.execute(f'DROP DATABASE IF EXISTS "{building}"')
+        await conn.execute(f'CREATE DATABASE "{building}"')
+
+        template_conn = await connect(
+            postgres.copy(update={"database": building})
+        )
+        try:
+            await migrate(template_conn, postgres)
+        finally:
+            await template_conn.close()
+
+        await conn.execute(f'ALTER DATABASE "{building}" RENAME TO "{name}"')
+        await conn.execute(f'ALTER DATABASE "{name}" IS_TEMPLATE true')
+    finally:
+        await conn.close()
+
+
+async def execute(postgres: PostgresConfig, query: str) -> None:
+    conn = await connect(postgres)
+    try:
+        await conn.execute(query)
+    finally:
+        await conn.close()
+
+
+@pytest.fixture(scope="session")
+def postgres_template() -> t.Tuple[PostgresConfig, str]:
+    try:
+        postgres = PostgresConfig(migrations_dir=PROJECT_ROOT / "migrations")
+    except ValidationError:
+        pytest.skip("Postgres is not configured")
+
+    name = template_name(postgres)
+    try:
+        asyncio.run(create_template(postgres, name))
+    except (
+        OSError,
+        asyncio.TimeoutError,
+        asyncpg.PostgresConnectionError,
+    ) as exc:
+        pytest.skip(f"Postgres is not running: {exc}")
+
+    return postgres, name
+
+
+@pytest.fixture
+def postgres(
+    postgres_template: t.Tuple[PostgresConfig, str],
+) -> t.Iterator[PostgresConfig]:
+    """
+    Config for a freshly migrated database that only this test uses.
+    """
+    admin, template = postgres_template
+    name = f"test_{os.getpid()}_{next(database_ids)}"
+
+    asyncio.run(
+        execute(admin, f'CREATE DATABASE "{name}" TEMPLATE "{template}"')
+    )
+    try:
+        yield admin.copy(update={"database": name})
+    finally:
+        asyncio.run(execute(admin, f'DROP DATABASE IF EXISTS "{name}"'))
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+from cryptography.fernet import Fernet
+
+from api.app import Invalid, State, StateEncryption
+from api.executor import Executor, ExecutorConfig, ExecutorKind
+
+
+@pytest.mark.parametrize("kind", list(ExecutorKind))
+def test_state_roundtrip(kind: ExecutorKind) -> None:
+    key = Fernet.generate_key()
+
+    async def main() -> None:
+        Executor.start(
+            ExecutorConfig(kind=kind, workers=1),
+            initializer=StateEncryption.init,
+            initargs=(key,),
+        )
+        try:
+            ciphertext = await State(redirect="/app").encrypt()
+            assert await State.decrypt(ciphertext) == State(redirect="/app")
+            # Encrypted with the key we passed in.
+            assert Fernet(key).decrypt(ciphertext.encode())
+
+            with pytest.raises(Invalid):
+                await State.decrypt("garbage")
+        finally:
+            Executor.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+import time
+
+from api.logs import (
+    REDACTED,
+    DeferredQueueHandler,
+    JsonFormatter,
+    RedactFilter,
+    SampleFilter,
+    queue_handler,
+)
+
+
+def make_record(**extra: object) -> logging.LogRecord:
+    record = logging.LogRecord(
+        "api.test", logging.INFO, __file__, 1, "hello %s", ("world",), None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter() -> None:
+    record = make_record(event="test.event", user_id=42)
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "api.test"
+    assert entry["message"] == "hello world"
+    assert entry["event"] == "test.event"
+    assert entry["user_id"] == 42
+
+
+def test_redact_filter() -> None:
+    record = make_record(session_id="secret", user_id=42)
+
+    assert RedactFilter(["session_id", "cookie"]).filter(record)
+    assert getattr(record, "session_id") == REDACTED
+    assert getattr(record, "user_id") == 42
+
+
+def test_sample_filter() -> None:
+    sample = SampleFilter({"never": 0.0, "always": 1.0})
+
+    assert not sample.filter(make_record(event="never"))
+    assert sample.filter(make_record(event="always"))
+    assert sample.filter(make_record(event="unlisted"))
+    assert sample.filter(make_record())
+
+
+def test_queue_handler() -> None:
+    stream = io.StringIO()
+    handler = queue_handler(redact=["session_id"], stream=stream)
+    assert isinstance(handler, DeferredQueueHandler)
+
+    record = make_record(session_id="secret")
+    handler.handle(record)
+    # Formatting happens on the listener thread, not in the caller.
+    assert record.msg == "hello %s"
+
+    deadline = time.monotonic() + 5
+    while not stream.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "hello world"
+    assert entry["session_id"] == REDACTED
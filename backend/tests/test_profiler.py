@@ -0,0 +1,76 @@
+import asyncio
+import pathlib
+import signal
+import time
+import typing as t
+
+from fastapi import FastAPI
+
+from api.profiler import (
+    UNMATCHED,
+    Profiler,
+    ProfilerConfig,
+    ProfilerMiddleware,
+    route_label,
+)
+from bench.harness import asgi_get
+
+
+def busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def get_user(user_id: int) -> t.Dict[str, int]:
+    busy(0.05)
+    await asyncio.sleep(0.05)
+    return {"user_id": user_id}
+
+
+def make_app() -> ProfilerMiddleware:
+    app = FastAPI()
+    app.get("/users/{user_id}")(get_user)
+    return ProfilerMiddleware(app)
+
+
+def test_profiler(tmp_path: pathlib.Path) -> None:
+    config = ProfilerConfig(enabled=True, interval=0.001, output_dir=tmp_path)
+    app = make_app()
+
+    async def main() -> None:
+        Profiler.start(config)
+        try:
+            await asyncio.gather(
+                asgi_get(app, "/users/1"),
+                asgi_get(app, "/users/2"),
+                asgi_get(app, "/nope"),
+            )
+            Profiler.dump()
+        finally:
+            Profiler.stop()
+
+        # Closing the loop would remove it anyway, check before that.
+        assert signal.getsignal(signal.SIGUSR1) == signal.SIG_DFL
+
+    asyncio.run(main())
+
+    first, second = sorted(tmp_path.glob("*.collapsed"))
+    lines = first.read_text().splitlines()
+
+    route = "GET /users/{user_id}"
+    cpu = [line for line in lines if line.startswith(f"{route};[cpu];")]
+    waiting = [line for line in lines if line.startswith(f"{route};[await];")]
+    assert any("busy (test_profiler.py" in line for line in cpu)
+    assert any("get_user (test_profiler.py" in line for line in waiting)
+    assert not any("/users/1" in line or "/nope" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    # Every dump starts over.
+    assert route not in second.read_text()
+
+
+def test_route_label() -> None:
+    scope = {"method": "GET", "path": "/nope"}
+    assert route_label(scope) == f"GET {UNMATCHED}"
+    assert route_label(scope, 7) == f"GET {UNMATCHED};request 7"
@@ -0,0 +1,169 @@
+import asyncio
+import datetime
+import http.cookies
+import typing as t
+import uuid
+
+import pytest
+
+from api.postgres import PostgresConfig, connect
+from api.session import (
+    NewSession,
+    Session,
+    SessionBatch,
+    SessionConfig,
+    SessionProblem,
+    SessionStatus,
+)
+
+EXPIRES_AT = datetime.datetime(
+    2021, 5, 4, 13, 37, 0, tzinfo=datetime.timezone.utc
+)
+
+
+def make_session() -> Session:
+    row = {
+        "user_id": 42,
+        "created_at": EXPIRES_AT - datetime.timedelta(days=1),
+        "expires_at": EXPIRES_AT,
+    }
+    return Session.from_record(row, uuid.uuid4(), SessionStatus.VALID)
+
+
+def test_from_record() -> None:
+    session = make_session()
+
+    assert session.user_id == 42
+    assert session.expires_at == EXPIRES_AT
+    assert session.status == SessionStatus.VALID
+    assert not hasattr(session, "__dict__")
+
+
+def test_as_cookie() -> None:
+    session = make_session()
+
+    cookie: http.cookies.SimpleCookie = http.cookies.SimpleCookie()
+    cookie.load(session.as_cookie().strip())
+    morsel = cookie["session_id"]
+
+    assert morsel.value == session.session_id.hex
+    assert morsel["expires"] == "Tue, 04 May 2021 13:37:00 GMT"
+    assert morsel["httponly"] is True
+    assert morsel["secure"] is True
+    assert morsel["samesite"] == "lax"
+    assert morsel["path"] == "/"
+
+    # Same format as building the cookie with `SimpleCookie`.
+    expected: http.cookies.SimpleCookie = http.cookies.SimpleCookie()
+    expected["session_id"] = session.session_id.hex
+    attributes: t.Dict[str, t.Any] = {
+        "expires": "Tue, 04 May 2021 13:37:00 GMT",
+        "httponly": True,
+        "secure": True,
+        "samesite": "lax",
+        "path": "/",
+    }
+    expected["session_id"].update(attributes)
+    assert session.as_cookie() == expected.output(header="")
+
+
+def test_create_and_load(postgres: PostgresConfig) -> None:
+    async def main() -> None:
+        conn = await connect(postgres)
+        try:
+            session = await NewSession(user_id=42).create(conn)
+            assert session.user_id == 42
+            assert session.status == SessionStatus.VALID
+
+            loaded = await Session.optional(conn, session.session_id.hex)
+            assert loaded == session
+
+            missing = await Session.optional(conn, uuid.uuid4().hex)
+            assert missing == SessionProblem.INVALID
+        finally:
+            await conn.close()
+
+    asyncio.run(main())
+
+
+def test_create_batched(postgres: PostgresConfig) -> None:
+    async def main() -> None:
+        conns = [await connect(postgres) for _ in range(3)]
+        SessionBatch.start(SessionConfig(batch_inserts=True), len(conns))
+        try:
+            sessions = await asyncio.gather(
+                *(
+                    NewSession(user_id=user_id).create(conn)
+                    for user_id, conn in enumerate(conns)
+                )
+            )
+            assert [session.user_id for session in sessions] == [0, 1, 2]
+
+            for session in sessions:
+                loaded = await Session.optional(
+                    conns[0], session.session_id.hex
+                )
+                assert loaded == session
+        finally:
+            SessionBatch.stop()
+            for conn in conns:
+                await conn.close()
+
+    asyncio.run(main())
+
+
+class SlowConnection:
+    """
+    Just enough of a connection for a batch insert, which takes a while.
+    """
+
+    def __init__(self) -> None:
+        self.busy = False
+
+    async def fetch(self, _query: str, *args: t.Any) -> t.List[t.Any]:
+        self.busy = True
+        await asyncio.sleep(0.05)
+        self.busy = False
+        return [
+            {
+                "session_id": session_id,
+                "user_id": user_id,
+                "created_at": EXPIRES_AT - datetime.timedelta(days=1),
+                "expires_at": EXPIRES_AT,
+            }
+            for session_id, user_id in zip(args[0], args[1])
+        ]
+
+
+def test_create_batched_cancelled() -> None:
+    async def main() -> None:
+        conns = [SlowConnection(), SlowConnection()]
+        SessionBatch.start(SessionConfig(batch_inserts=True), len(conns))
+        try:
+            first, second = [
+                asyncio.ensure_future(
+                    NewSession(user_id=user_id).create(t.cast(t.Any, conn))
+                )
+                for user_id, conn in enumerate(conns)
+            ]
+            # Let the batch start on the first connection.
+            while not conns[0].busy:
+                await asyncio.sleep(0.001)
+
+            first.cancel()
+            await asyncio.gather(first, return_exceptions=True)
+            # Still checked out until the batch was done with it.
+            assert not conns[0].busy
+            assert first.cancelled()
+            assert (await second).user_id == 1
+        finally:
+            SessionBatch.stop()
+
+    asyncio.run(main())
+
+
+def test_batch_larger_than_pool() -> None:
+    config = SessionConfig(batch_inserts=True, batch_max_size=20)
+    with pytest.raises(ValueError):
+        SessionBatch.start(config, 10)
+    assert SessionBatch.batched() is None
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import pathlib
+import typing as t
+
+import brotli  # type: ignore
+
+from api.static import (
+    IMMUTABLE,
+    MANIFEST,
+    REVALIDATE,
+    StaticAssets,
+    build,
+    is_stale,
+)
+from bench.harness import asgi_get
+
+SCRIPT = b"console.log('hello');\n" * 100
+PAGE = """<link rel="stylesheet" href="/static/css/app.css">
+<script src="js/app.js?v=1"></script>
+<a href="https://example.com/js/app.js">elsewhere</a>
+"""
+
+
+def get(
+    app: StaticAssets, path: str, headers: t.Dict[str, str]
+) -> t.Tuple[int, t.Dict[str, str], bytes]:
+    return asyncio.run(asgi_get(app, path, headers))
+
+
+def make_assets(tmp_path: pathlib.Path) -> t.Tuple[StaticAssets, str]:
+    source = tmp_path / "static"
+    (source / "js").mkdir(parents=True)
+    (source / "js" / "app.js").write_bytes(SCRIPT)
+    (source / "css").mkdir()
+    (source / "css" / "app.css").write_text(
+        "p { background: url(../logo.png) }"
+    )
+    (source / "logo.png").write_bytes(b"png")
+    (source / "index.html").write_text(PAGE)
+
+    target = tmp_path / "build"
+    manifest = build(source, target)
+
+    assert json.loads((target / MANIFEST).read_text()) == manifest
+    assert (target / manifest["js/app.js"]).read_bytes() == SCRIPT
+    assert (target / f"{manifest['js/app.js']}.br").exists()
+    assert (target / f"{manifest['js/app.js']}.gz").exists()
+    # Too small to compress.
+    assert not (target / f"{manifest['index.html']}.gz").exists()
+
+    return StaticAssets(directory=target, html=True), manifest["js/app.js"]
+
+
+def test_content_negotiation(tmp_path: pathlib.Path) -> None:
+    app, script = make_assets(tmp_path)
+
+    status, headers, body = get(app, f"/{script}", {"accept-encoding": "br"})
+    assert status == 200
+    assert headers["content-encoding"] == "br"
+    assert headers["cache-control"] == IMMUTABLE
+    assert headers["vary"] == "accept-encoding"
+    assert brotli.decompress(body) == SCRIPT
+
+    _, headers, _ = get(app, f"/{script}", {"accept-encoding": "gzip, br;q=0"})
+    assert headers["content-encoding"] == "gzip"
+
+    _, headers, _ = get(app, f"/{script}", {"accept-encoding": "br;q=0, *"})
+    assert headers["content-encoding"] == "gzip"
+
+    _, headers, body = get(app, f"/{script}", {})
+    assert "content-encoding" not in headers
+    assert body == SCRIPT
+
+
+def test_caching(tmp_path: pathlib.Path) -> None:
+    app, _ = make_assets(tmp_path)
+
+    status, headers, _ = get(app, "/js/app.js", {"accept-encoding": "gzip"})
+    assert status == 200
+    assert headers["cache-control"] == REVALIDATE
+
+    status, _, body = get(
+        app,
+        "/js/app.js",
+        {"accept-encoding": "gzip", "if-none-match": headers["etag"]},
+    )
+    assert status == 304
+    assert body == b""
+
+    status, _, body = get(app, "/", {})
+    assert status == 200
+    assert body.startswith(b"<link")
+
+
+def test_rewrite_references(tmp_path: pathlib.Path) -> None:
+    make_assets(tmp_path)
+    manifest = json.loads((tmp_path / "build" / MANIFEST).read_text())
+    css, script = manifest["css/app.css"], manifest["js/app.js"]
+    logo = manifest["logo.png"]
+
+    page = (tmp_path / "build" / "index.html").read_text()
+    assert f'href="/static/{css}"' in page
+    assert f'src="{script}?v=1"' in page
+    assert 'href="https://example.com/js/app.js"' in page
+
+    stylesheet = (tmp_path / "build" / css).read_text()
+    assert f"url(../{logo})" in stylesheet
+
+
+def test_cache_budget(tmp_path: pathlib.Path) -> None:
+    make_assets(tmp_path)
+    app = StaticAssets(directory=tmp_path / "build", max_cached_total=2000)
+
+    cached = sum(
+        len(variant.content or b"")
+        for asset in app.assets.values()
+        for variant in asset.variants.values()
+    )
+    assert app.cached_total <= 2000
+    # Original and fingerprinted names share their variants.
+    assert cached == 2 * app.cached_total
+    assert app.assets["js/app.js"].variants["identity"].content is None
+
+
+def test_is_stale(tmp_path: pathlib.Path) -> None:
+    make_assets(tmp_path)
+    source, target = tmp_path / "static", tmp_path / "build"
+    assert not is_stale(source, target)
+
+    built_at = (target / MANIFEST).stat().st_mtime
+    (source / "logo.png").touch()
+    os.utime(source / "logo.png", (built_at + 1, built_at + 1))
+    assert is_stale(source, target)
@@ -1,6 +1,23 @@
+import asyncio
+import gc
+import typing as t
+import warnings
+
 import pytest
+from hypothesis import given
+from hypothesis import strategies as st
 
-from api.utils import ignore_exc, maybe, maybe_ignore_exc
+from api.utils import (
+    Batched,
+    aignore_exc,
+    amaybe,
+    batched,
+    gather_limited,
+    ignore_exc,
+    maybe,
+    maybe_ignore_exc,
+    with_timeout,
+)
 
 
 def test_ignore_exc() -> None:
@@ -26,3 +43,158 @@ def test_maybe_ignore_exc() -> None:
 
     with pytest.raises(ValueError):
         maybe_ignore_exc(int, TypeError, "foo")  # Not caught, escapes.
+
+
+async def async_int(val: str) -> int:
+    await asyncio.sleep(0)
+    return int(val)
+
+
+def test_amaybe() -> None:
+    assert asyncio.run(amaybe(async_int, "42")) == 42
+    assert asyncio.run(amaybe(async_int, None)) is None
+    with pytest.raises(ValueError):
+        asyncio.run(amaybe(async_int, "foo"))
+
+
+def test_aignore_exc() -> None:
+    assert asyncio.run(aignore_exc(async_int, ValueError, "foo")) is None
+    assert asyncio.run(aignore_exc(async_int, ValueError, "42")) == 42
+    with pytest.raises(ValueError):
+        asyncio.run(aignore_exc(async_int, TypeError, "foo"))
+
+
+def test_with_timeout() -> None:
+    assert asyncio.run(with_timeout(1, async_int("42"))) == 42
+    assert asyncio.run(with_timeout(0.01, asyncio.sleep(1))) is None
+
+
+@given(
+    values=st.lists(st.integers()),
+    limit=st.integers(min_value=1, max_value=10),
+)
+def test_gather_limited(values: t.List[int], limit: int) -> None:
+    running = 0
+    max_running = 0
+
+    async def work(val: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        return val
+
+    results = asyncio.run(gather_limited(limit, map(work, values)))
+
+    assert results == values
+    assert max_running <= limit
+
+
+def test_gather_limited_propagates_exceptions() -> None:
+    with pytest.raises(ValueError):
+        asyncio.run(gather_limited(2, [async_int("1"), async_int("foo")]))
+    with pytest.raises(ValueError):
+        asyncio.run(gather_limited(0, []))
+
+
+def test_gather_limited_cleans_up(caplog: pytest.LogCaptureFixture) -> None:
+    async def bad() -> int:
+        raise ValueError()
+
+    awaitables = [bad(), async_int("1"), async_int("2"), bad()]
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        with pytest.raises(ValueError):
+            asyncio.run(gather_limited(1, awaitables))
+        del awaitables
+        gc.collect()
+
+    # No "coroutine was never awaited".
+    assert not caught
+    # No "Task exception was never retrieved".
+    assert not caplog.records
+
+
+@given(
+    keys=st.lists(st.integers(min_value=0, max_value=50)),
+    max_batch_size=st.one_of(st.none(), st.integers(min_value=1, max_value=8)),
+)
+def test_batched(keys: t.List[int], max_batch_size: t.Optional[int]) -> None:
+    batches: t.List[t.List[int]] = []
+
+    # Odd keys are "missing from the database".
+    @batched(max_batch_size=max_batch_size)
+    async def squares(batch: t.List[int]) -> t.Dict[int, int]:
+        batches.append(batch)
+        await asyncio.sleep(0)
+        return {key: key * key for key in batch if key % 2 == 0}
+
+    async def main() -> t.List[t.Optional[int]]:
+        return list(await asyncio.gather(*map(squares.load, keys)))
+
+    results = asyncio.run(main())
+
+    assert results == [key * key if key % 2 == 0 else None for key in keys]
+    # Each unique key is loaded exactly once.
+    assert sorted(sum(batches, [])) == sorted(set(keys))
+    if max_batch_size is None:
+        assert len(batches) == (1 if keys else 0)
+    else:
+        assert all(len(batch) <= max_batch_size for batch in batches)
+
+
+def test_batched_propagates_exceptions() -> None:
+    async def fail(_batch: t.List[int]) -> t.Dict[int, int]:
+        raise ValueError()
+
+    loader = Batched(fail)
+
+    async def main() -> t.List[t.Any]:
+        return list(
+            await asyncio.gather(
+                loader.load(1), loader.load(2), return_exceptions=True
+            )
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(res, ValueError) for res in results)
+
+
+def test_batched_propagates_cancellation() -> None:
+    async def cancelled(_batch: t.List[int]) -> t.Dict[int, int]:
+        raise asyncio.CancelledError()
+
+    loader = Batched(cancelled)
+
+    async def main() -> t.List[t.Any]:
+        loads = asyncio.gather(
+            loader.load(1), loader.load(2), return_exceptions=True
+        )
+        # Fails with a timeout instead of hanging when nobody resolves
+        # the callers.
+        return list(await asyncio.wait_for(loads, timeout=1))
+
+    results = asyncio.run(main())
+    assert all(isinstance(res, asyncio.CancelledError) for res in results)
+
+
+def test_batched_window() -> None:
+    batches: t.List[t.List[int]] = []
+
+    @batched(window=0.05)
+    async def identity(batch: t.List[int]) -> t.Dict[int, int]:
+        batches.append(batch)
+        return {key: key for key in batch}
+
+    async def load_later(key: int) -> t.Optional[int]:
+        # A few iterations of the event loop later, but within the window.
+        for _ in range(3):
+            await asyncio.sleep(0)
+        return await identity.load(key)
+
+    async def main() -> t.List[t.Optional[int]]:
+        return list(await asyncio.gather(identity.load(1), load_later(2)))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert batches == [[1, 2]]
@@ -58,7 +58,7 @@ def run_lints(mode: Mode) -> None:
     run_lint(["isort"] + extra_args + ["--skip-gitignore", backend_root])
     run_lint(["flake8", backend_root + "/api"])
     run_lint(["mypy", "--strict", "--allow-redefinition", backend_root])
-    run_lint(["pylint", "api", "tests"], cwd=backend_root)
+    run_lint(["pylint", "api", "tests", "bench"], cwd=backend_root)
 
 
 def install_git_hook() -> None:
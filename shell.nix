@@ -9,6 +9,7 @@ let
   pythonEnv = pkgs.python38.withPackages (ps: [
     ps.asyncpg
     ps.black
+    ps.brotli
     ps.cryptography
     ps.fastapi
     ps.flake8
@@ -19,6 +20,7 @@ let
     ps.mypy
     ps.pylint
     ps.pytest
+    ps.pytest_xdist
     ps.typer
     ps.uvicorn
   ]);